@@ -0,0 +1,32 @@
+"""Compares rendering sitemaps with the Jinja2 template and with the direct XML writer
+
+Run with `python benchmarks/bench_engines.py`
+"""
+
+from timeit import timeit
+
+from flask_sitemapper.engines import JinjaEngine, WriterEngine
+from flask_sitemapper.templates import SITEMAP
+from flask_sitemapper.url import URL
+
+SIZES = [10_000, 100_000, 1_000_000]
+
+
+def make_urls(size: int) -> list:
+    """Creates prebuilt URLs, so that only the cost of rendering is measured"""
+    return [
+        URL("r_user", "https", "2024-01-01", "daily", 0.5, loc=f"https://example.com/user/{i}")
+        for i in range(size)
+    ]
+
+
+def main() -> None:
+    for size in SIZES:
+        urls = make_urls(size)
+        jinja = timeit(lambda: JinjaEngine().render(SITEMAP, urls), number=1)
+        writer = timeit(lambda: WriterEngine().render(SITEMAP, urls), number=1)
+        print(f"{size:>9} URLs: jinja {jinja * 1e3:9.1f} ms, writer {writer * 1e3:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
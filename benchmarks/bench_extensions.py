@@ -0,0 +1,48 @@
+"""Compares rendering a full 50,000 URL shard with and without hreflang alternates and images
+
+Run with `python benchmarks/bench_extensions.py`
+"""
+
+from timeit import timeit
+
+from flask_sitemapper.engines import JinjaEngine, WriterEngine
+from flask_sitemapper.extensions import Alternate, Image
+from flask_sitemapper.templates import SITEMAP
+from flask_sitemapper.url import URL
+
+SIZE = 50_000
+
+
+def make_urls(extended: bool) -> list:
+    """Creates prebuilt URLs, each with two alternates and an image if `extended` is True"""
+    return [
+        URL(
+            "r_product",
+            "https",
+            "2024-01-01",
+            loc=f"https://example.com/product/{i}",
+            extensions=(
+                (
+                    Alternate("fr", f"https://example.fr/product/{i}"),
+                    Alternate("de", f"https://example.de/product/{i}"),
+                    Image(f"https://cdn.example.com/{i}.jpg"),
+                )
+                if extended
+                else ()
+            ),
+        )
+        for i in range(SIZE)
+    ]
+
+
+def main() -> None:
+    for extended in [False, True]:
+        urls = make_urls(extended)
+        jinja = timeit(lambda: JinjaEngine().render(SITEMAP, urls), number=1)
+        writer = timeit(lambda: WriterEngine().render(SITEMAP, urls), number=1)
+        label = "extensions" if extended else "plain"
+        print(f"{label:>10}: jinja {jinja * 1e3:7.1f} ms, writer {writer * 1e3:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""Compares dispatching requests to views with and without the `include` decorator
+
+Run with `python benchmarks/bench_include.py`
+"""
+
+from timeit import timeit
+
+import flask
+
+from flask_sitemapper import Sitemapper
+
+REQUESTS = 20_000
+
+
+def make_app() -> flask.Flask:
+    """Creates an app with a plain view and a view registered by the decorated function"""
+    sitemapper = Sitemapper()
+    app = flask.Flask(__name__)
+
+    @app.route("/plain")
+    def r_plain():
+        return "<h1>Plain</h1>"
+
+    # include is applied first, so that the app dispatches requests to the decorated function
+    @app.route("/decorated")
+    @sitemapper.include()
+    def r_decorated():
+        return "<h1>Decorated</h1>"
+
+    sitemapper.init_app(app)
+    return app
+
+
+def main() -> None:
+    app = make_app()
+    for path in ["/plain", "/decorated"]:
+        with app.test_request_context(path):
+            seconds = timeit(app.full_dispatch_request, number=REQUESTS)
+        print(f"{path:>10}: {seconds / REQUESTS * 1e6:6.2f} us per request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""Measures adding every route of an app with many routes to the sitemap with `include`
+
+Run with `python benchmarks/bench_registration.py`
+"""
+
+from timeit import timeit
+
+import flask
+
+from flask_sitemapper import Sitemapper
+
+SIZES = [500, 2_000, 10_000]
+
+
+def register(size: int) -> None:
+    """Creates an app with `size` routes, each decorated with `include`"""
+    sitemapper = Sitemapper()
+    app = flask.Flask(__name__)
+    sitemapper.init_app(app)
+
+    for i in range(size):
+
+        def view():
+            return ""
+
+        view.__name__ = f"r_page_{i}"
+        sitemapper.include()(app.route(f"/page/{i}")(view))
+
+
+def main() -> None:
+    for size in SIZES:
+        seconds = timeit(lambda: register(size), number=1)
+        print(f"{size:>6} routes: {seconds * 1e3:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Compares compiling the sitemap template per request with reusing the precompiled template
+
+Run with `python benchmarks/bench_templates.py`
+"""
+
+from timeit import timeit
+
+import flask
+from jinja2 import BaseLoader, Environment
+
+from flask_sitemapper import Sitemapper
+from flask_sitemapper.templates import SITEMAP, compile_template
+
+NUMBER = 1000
+
+
+def make_app() -> flask.Flask:
+    """Creates an app with a small, uncached sitemap so that the template cost dominates"""
+    app = flask.Flask(__name__)
+    sitemapper = Sitemapper(app)
+
+    @app.route("/")
+    def r_home():
+        return "<h1>Home</h1>"
+
+    # a callable disables the xml cache, so every request renders the template
+    sitemapper.add_endpoint("r_home", url_variables=lambda: {})
+
+    @app.route("/sitemap.xml")
+    def r_sitemap():
+        return sitemapper.generate()
+
+    return app
+
+
+def main() -> None:
+    per_request = timeit(
+        lambda: Environment(loader=BaseLoader).from_string(SITEMAP), number=NUMBER
+    )
+    precompiled = timeit(lambda: compile_template(SITEMAP), number=NUMBER)
+    print(f"compile per request: {per_request / NUMBER * 1e6:10.1f} us/request")
+    print(f"precompiled:         {precompiled / NUMBER * 1e6:10.1f} us/request")
+
+    client = make_app().test_client()
+    generate = timeit(lambda: client.get("/sitemap.xml"), number=NUMBER)
+    print(f"full sitemap request: {generate / NUMBER * 1e6:9.1f} us/request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Compares the memory used by URL objects with a __dict__ and with the slotted `URL` class
+
+Run with `python benchmarks/bench_url_memory.py`
+"""
+
+import gc
+import tracemalloc
+
+from flask_sitemapper.url import URL
+
+NUMBER = 1_000_000
+
+
+class DictURL:
+    """The previous layout of `URL`, with a __dict__ and without interned strings"""
+
+    def __init__(self, endpoint, scheme, lastmod, changefreq, priority, url_variables, loc):
+        self.endpoint = endpoint
+        self.scheme = scheme
+        self.lastmod = lastmod
+        self.changefreq = changefreq
+        self.priority = priority
+        self.url_variables = url_variables
+        self._loc = loc
+
+
+def make_rows() -> list:
+    """Creates rows of sitemap arguments, building strings at runtime as a database would"""
+    changefreqs = ["daily", "weekly", "monthly"]
+    return [
+        (
+            "r_user",
+            "https",
+            "2024-01-01",
+            "".join(changefreqs[i % 3]),
+            (i % 10) / 10 + 0.1,
+            {"id": i},
+            f"https://example.com/user/{i}",
+        )
+        for i in range(NUMBER)
+    ]
+
+
+def measure(cls, rows: list) -> int:
+    """Measures the bytes allocated by creating an object of `cls` for every row"""
+    gc.collect()
+    tracemalloc.start()
+    urls = [cls(*row) for row in rows]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del urls
+    return size
+
+
+def main() -> None:
+    rows = make_rows()
+    before = measure(DictURL, rows)
+    after = measure(URL, rows)
+    print(f"__dict__ URLs: {before / 2**20:8.1f} MiB for {NUMBER} URLs")
+    print(f"slotted URLs:  {after / 2**20:8.1f} MiB for {NUMBER} URLs")
+
+
+if __name__ == "__main__":
+    main()
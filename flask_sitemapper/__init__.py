@@ -1,3 +1,6 @@
 """Flask extension for generating XML sitemaps. See https://github.com/h-janes/flask-sitemapper"""
 
+from .extensions import Alternate, Image, News, Video
+from .providers import LastmodTracker, Paginator
 from .sitemapper import Sitemapper
+from .stores import FilesystemStore, SQLiteStore
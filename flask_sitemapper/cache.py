@@ -0,0 +1,301 @@
+"""Provides the `XMLCache` class for storing rendered sitemaps, and `SharedCache` for sharing them
+between processes through a store
+"""
+
+import json
+from collections import OrderedDict
+from contextlib import nullcontext
+from datetime import datetime
+from hashlib import sha256
+from threading import Lock
+from time import monotonic, time
+from typing import Any, Callable, ContextManager, Hashable, Tuple, Union
+from uuid import uuid4
+
+from .conditional import make_etag
+
+
+class CachedSitemap:
+    """A rendered sitemap with its validators and any compressed copies of it"""
+
+    def __init__(self, xml: bytes, last_modified: datetime = None, etag: str = None) -> None:
+        # maps content encodings to the encoded XML, compressed copies are added when requested,
+        # and a shared cache leaves out the XML until it is loaded for a response
+        self.encodings = {} if xml is None else {"identity": xml}
+
+        # validators for conditional requests
+        self.etag = etag or make_etag(xml)
+        self.last_modified = last_modified
+
+
+class XMLCache:
+    """A thread-safe LRU cache of rendered sitemaps with optional expiry"""
+
+    def __init__(self, ttl: float = None, max_entries: int = 32) -> None:
+        # seconds before an entry expires, or None to keep entries until evicted or invalidated
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        # maps cache keys to (expiry time, value) tuples, least recently used first
+        self.entries = OrderedDict()
+        self.lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: Hashable) -> Any:
+        """Returns the cached value for `key`, or None if it is missing or expired"""
+        with self.lock:
+            item = self.entries.get(key)
+            if item is None:
+                return None
+
+            # drop expired entries instead of returning them
+            expires, value = item
+            if expires is not None and expires <= monotonic():
+                del self.entries[key]
+                return None
+
+            # mark the entry as recently used
+            self.entries.move_to_end(key)
+            return value
+
+    def get_stale(self, key: Hashable) -> Tuple[Any, bool]:
+        """Returns the cached value for `key` even if it has expired, and whether it is fresh"""
+        with self.lock:
+            item = self.entries.get(key)
+            if item is None:
+                return None, False
+
+            # mark the entry as recently used
+            self.entries.move_to_end(key)
+            expires, value = item
+            return value, expires is None or expires > monotonic()
+
+    def keys(self) -> list:
+        """Returns the keys of all entries, including expired entries"""
+        with self.lock:
+            return list(self.entries)
+
+    def expire(self) -> None:
+        """Marks all entries as expired, so only `get_stale` returns them"""
+        now = monotonic()
+        with self.lock:
+            for key, (_, value) in list(self.entries.items()):
+                self.entries[key] = (now, value)
+
+    def set(self, key: Hashable, value: Any, ttl: float = None) -> None:
+        """Stores `value` under `key`, evicting the least recently used entries if full
+
+        `ttl` overrides the cache's expiry for this entry if it is provided.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        expires = None if ttl is None else monotonic() + ttl
+        with self.lock:
+            self.entries[key] = (expires, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self, predicate: Callable = None) -> None:
+        """Removes all entries from the cache, or only those whose keys match `predicate`"""
+        with self.lock:
+            if predicate is None:
+                self.entries.clear()
+                return
+
+            for key in [key for key in self.entries if predicate(key)]:
+                del self.entries[key]
+
+    def build_lock(self, key: Hashable) -> ContextManager:
+        """Gets a lock shared with other processes for building `key`, which is not needed here"""
+        return nullcontext()
+
+    def updated_since(self, key: Hashable, timestamp: float) -> bool:
+        """Whether another process has stored `key` since `timestamp`, which cannot happen here"""
+        return False
+
+    def generation(self) -> None:
+        """Returns None, as no other process can invalidate the sitemap"""
+        return None
+
+    def new_generation(self) -> None:
+        """Does nothing, as no other process keeps a copy of what this cache holds"""
+
+    def get_encoding(self, key: Hashable, cached: CachedSitemap, encoding: str) -> None:
+        """Returns None, as every encoding this cache holds is in `cached.encodings` already"""
+        return None
+
+    def add_encoding(self, key: Hashable, cached: CachedSitemap, encoding: str) -> None:
+        """Stores a compressed copy added to `cached`, which this cache holds already"""
+
+
+class SharedCache:
+    """A cache of rendered sitemaps in a store shared by processes, such as a Redis client
+
+    Has the same interface as `XMLCache`. Each encoding of a sitemap is stored under its own name,
+    with its metadata stored as JSON. Cache keys must be JSON serializable, and expiry times use
+    the system clock, which the processes share.
+    """
+
+    def __init__(
+        self, store, ttl: float = None, max_entries: int = 32, prefix: str = "sitemapper-"
+    ):
+        self.store = store
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.prefix = prefix
+
+        # seconds before a lock held by a process which died building a sitemap is taken over, which
+        # must exceed the slowest build for stores whose locks expire while held, such as Redis
+        self.lock_timeout = 60
+
+    def __len__(self) -> int:
+        return len(self.keys())
+
+    def __name(self, key: Hashable, suffix: str) -> str:
+        """Gets the name in the store of something stored for `key`"""
+        digest = sha256(json.dumps(key).encode("utf-8")).hexdigest()
+        return f"{self.prefix}{digest}{suffix}"
+
+    def __get_meta(self, key: Hashable) -> Union[dict, None]:
+        """Gets the metadata stored for `key`, or None if it is missing"""
+        data = self.store.get(self.__name(key, ".meta"))
+        return None if data is None else json.loads(bytes(data))
+
+    def __set_meta(self, key: Hashable, meta: dict) -> None:
+        self.store.set(self.__name(key, ".meta"), json.dumps(meta).encode("utf-8"))
+
+    def __iter_metas(self) -> list:
+        """Gets the metadata of every entry, ignoring entries removed meanwhile"""
+        metas = []
+        for name in self.store.scan_iter(match=f"{self.prefix}*.meta"):
+            data = self.store.get(name.decode() if isinstance(name, bytes) else name)
+            if data is not None:
+                metas.append(json.loads(bytes(data)))
+        return metas
+
+    @staticmethod
+    def __load(meta: dict) -> CachedSitemap:
+        """Creates a sitemap from its metadata, leaving its encodings to be loaded when needed"""
+        last_modified = meta["last_modified"]
+        return CachedSitemap(
+            None, datetime.fromisoformat(last_modified) if last_modified else None, meta["etag"]
+        )
+
+    def get(self, key: Hashable) -> Any:
+        """Returns the cached value for `key`, or None if it is missing or expired"""
+        cached, fresh = self.get_stale(key)
+        return cached if fresh else None
+
+    def get_stale(self, key: Hashable) -> Tuple[Any, bool]:
+        """Returns the cached value for `key` even if it has expired, and whether it is fresh"""
+        meta = self.__get_meta(key)
+        if meta is None:
+            return None, False
+
+        cached = self.__load(meta)
+        expires = meta["expires"]
+        return cached, expires is None or expires > time()
+
+    def keys(self) -> list:
+        """Returns the keys of all entries, including expired entries"""
+        return [tuple(meta["key"]) for meta in self.__iter_metas()]
+
+    def expire(self) -> None:
+        """Marks all entries as expired, so only `get_stale` returns them"""
+        now = time()
+        for meta in self.__iter_metas():
+            meta["expires"] = now
+            self.__set_meta(tuple(meta["key"]), meta)
+
+    def set(self, key: Hashable, value: CachedSitemap, ttl: float = None) -> None:
+        """Stores `value` under `key`, removing the oldest entries if full
+
+        `ttl` overrides the cache's expiry for this entry if it is provided.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        previous = self.__get_meta(key)
+
+        # store the encodings before the metadata which refers to them
+        for encoding, data in value.encodings.items():
+            self.store.set(self.__name(key, f".{value.etag}.{encoding}"), data)
+
+        now = time()
+        meta = {
+            "key": key,
+            "etag": value.etag,
+            "last_modified": value.last_modified.isoformat() if value.last_modified else None,
+            "expires": None if ttl is None else now + ttl,
+            "stored": now,
+            "encodings": [encoding for encoding in value.encodings if encoding != "identity"],
+        }
+        self.__set_meta(key, meta)
+
+        # remove the encodings of the previous sitemap if it has changed
+        if previous is not None and previous["etag"] != value.etag:
+            self.__delete_encodings(previous)
+
+        # the least recently stored entries are removed, as reads are not tracked
+        metas = self.__iter_metas()
+        if len(metas) > self.max_entries:
+            metas.sort(key=lambda meta: meta["stored"])
+            for meta in metas[: len(metas) - self.max_entries]:
+                self.__delete(meta)
+
+    def __delete_encodings(self, meta: dict) -> None:
+        key, etag = meta["key"], meta["etag"]
+        encodings = ["identity", *meta["encodings"]]
+        self.store.delete(*(self.__name(key, f".{etag}.{encoding}") for encoding in encodings))
+
+    def __delete(self, meta: dict) -> None:
+        """Removes an entry's metadata and then its encodings"""
+        self.store.delete(self.__name(meta["key"], ".meta"))
+        self.__delete_encodings(meta)
+
+    def clear(self, predicate: Callable = None) -> None:
+        """Removes all entries from the cache, or only those whose keys match `predicate`"""
+        for meta in self.__iter_metas():
+            if predicate is None or predicate(tuple(meta["key"])):
+                self.__delete(meta)
+
+    def build_lock(self, key: Hashable) -> ContextManager:
+        """Gets a lock shared with other processes, held while the sitemap for `key` is built"""
+        return self.store.lock(self.__name(key, ".lock"), timeout=self.lock_timeout)
+
+    def updated_since(self, key: Hashable, timestamp: float) -> bool:
+        """Whether `key` has been stored since `timestamp`, such as by another process"""
+        meta = self.__get_meta(key)
+        return meta is not None and meta["stored"] > timestamp
+
+    def generation(self) -> Union[str, None]:
+        """Gets a token which changes each time any process invalidates the sitemap"""
+        data = self.store.get(f"{self.prefix}generation")
+        return None if data is None else bytes(data).decode("ascii")
+
+    def new_generation(self) -> None:
+        """Changes the generation, so every process knows to render the sitemap again
+
+        A random token is stored rather than a counter, so concurrent invalidations do not race.
+        """
+        self.store.set(f"{self.prefix}generation", uuid4().hex.encode("ascii"))
+
+    def get_encoding(
+        self, key: Hashable, cached: CachedSitemap, encoding: str
+    ) -> Union[bytes, None]:
+        """Loads one encoding of `cached`, or None if it is not stored"""
+        data = self.store.get(self.__name(key, f".{cached.etag}.{encoding}"))
+        if data is None and encoding == "identity":
+            # remove an entry whose xml has gone, such as when a store evicted it, to rebuild it
+            meta = self.__get_meta(key)
+            if meta is not None and meta["etag"] == cached.etag:
+                self.__delete(meta)
+        return data
+
+    def add_encoding(self, key: Hashable, cached: CachedSitemap, encoding: str) -> None:
+        """Stores a compressed copy added to `cached`, if the sitemap has not changed meanwhile"""
+        self.store.set(self.__name(key, f".{cached.etag}.{encoding}"), cached.encodings[encoding])
+        meta = self.__get_meta(key)
+        if meta is not None and meta["etag"] == cached.etag and encoding not in meta["encodings"]:
+            meta["encodings"].append(encoding)
+            self.__set_meta(key, meta)
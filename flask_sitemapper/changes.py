@@ -0,0 +1,34 @@
+"""Provides fingerprints of rendered sitemaps, for finding the URLs which changed between them"""
+
+import re
+from hashlib import blake2b
+from typing import Dict, NamedTuple, Set
+from xml.sax.saxutils import unescape
+
+# matches the location and the remaining tags of each entry in a sitemap or sitemap index
+ENTRY = re.compile(r"<(url|sitemap)>\s*<loc>([^<]*)</loc>(.*?)</\1>", re.DOTALL)
+
+
+class SitemapChanges(NamedTuple):
+    """The locations added to, removed from, and modified in a sitemap since it was last built"""
+
+    added: Set[str]
+    removed: Set[str]
+    modified: Set[str]
+
+
+def fingerprint(xml: str) -> Dict[str, bytes]:
+    """Maps the location of each entry in the XML to a short hash of its lastmod and other tags"""
+    return {
+        unescape(match.group(2)): blake2b(match.group(3).encode("utf-8"), digest_size=8).digest()
+        for match in ENTRY.finditer(xml)
+    }
+
+
+def diff(previous: Dict[str, bytes], current: Dict[str, bytes]) -> SitemapChanges:
+    """Compares the fingerprints of two builds of a sitemap"""
+    return SitemapChanges(
+        added=current.keys() - previous.keys(),
+        removed=previous.keys() - current.keys(),
+        modified={loc for loc, digest in current.items() if previous.get(loc, digest) != digest},
+    )
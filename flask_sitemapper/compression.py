@@ -0,0 +1,78 @@
+"""Provides content negotiation and compression with gzip, and with brotli and zstd if installed"""
+
+from typing import Iterable, Union
+
+from flask import Response, request
+
+from .gzip import gzip_compress
+
+# brotli and zstd are only used if their libraries are installed
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# functions compressing bytes at a given level for each available content encoding
+COMPRESSORS = {"gzip": gzip_compress}
+if brotli is not None:
+    COMPRESSORS["br"] = lambda data, level: brotli.compress(data, quality=level)
+if zstandard is not None:
+    COMPRESSORS["zstd"] = lambda data, level: zstandard.ZstdCompressor(level).compress(data)
+
+# encodings in order of preference, for when the client accepts several of them equally
+PREFERENCE = ["br", "zstd", "gzip"]
+
+# levels for responses compressed per request, as cached sitemaps are compressed at the levels
+# configured for `Sitemapper`
+FAST_LEVELS = {"gzip": 6, "br": 5, "zstd": 3}
+
+
+def available_encodings(encodings: Iterable[str] = None) -> list:
+    """Filters `encodings`, or every supported encoding, to those whose libraries are installed"""
+    encodings = PREFERENCE if encodings is None else encodings
+    return [encoding for encoding in encodings if encoding in COMPRESSORS]
+
+
+def negotiate_encoding(encodings: Iterable[str]) -> Union[str, None]:
+    """Chooses the encoding with the highest q-value in the request's Accept-Encoding header
+
+    Ties are broken by the order of `encodings`. Returns None if the client accepts none of them.
+    """
+    accepted = request.accept_encodings
+    best, best_quality = None, 0
+    for encoding in encodings:
+        quality = accepted.quality(encoding)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(data: bytes, encoding: str, level: int) -> bytes:
+    """Compresses bytes using `encoding`"""
+    return COMPRESSORS[encoding](data, level)
+
+
+def compress_response(response: Response, encoding: str, level: int) -> Response:
+    """Compresses a Flask `Response` using `encoding`"""
+    # return unedited response if it should not be compressed
+    if (
+        response.status_code < 200
+        or response.status_code >= 300
+        or "Content-Encoding" in response.headers
+    ):
+        return response
+
+    # avoid issues with direct_passthrough
+    response.direct_passthrough = False
+
+    # compress the response
+    response.set_data(compress(response.get_data(), encoding, level))
+    response.headers["Content-Encoding"] = encoding
+    response.headers["Content-Length"] = response.content_length
+
+    return response
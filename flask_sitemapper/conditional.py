@@ -0,0 +1,43 @@
+"""Provides helpers for answering conditional requests for sitemaps"""
+
+from datetime import datetime
+from hashlib import sha256
+from typing import Iterable, Iterator, Union
+
+from .url import URL
+
+
+def make_etag(data: bytes) -> str:
+    """Creates a strong ETag from a hash of the content"""
+    return sha256(data).hexdigest()
+
+
+def parse_lastmod(lastmod: str) -> Union[datetime, None]:
+    """Parses a W3C datetime lastmod, returning None if it is not in a supported format"""
+    try:
+        return datetime.fromisoformat(lastmod.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+class LastModified:
+    """Wraps an iterable of URLs, finding the latest lastmod of the URLs as they are iterated"""
+
+    def __init__(self, urls: Iterable[URL]) -> None:
+        self.urls = urls
+
+        # compared as strings, which orders W3C datetimes correctly unless time zones differ
+        self.latest = None
+
+    def __iter__(self) -> Iterator[URL]:
+        for url in self.urls:
+            if url.lastmod:
+                lastmod = str(url.lastmod)
+                if self.latest is None or lastmod > self.latest:
+                    self.latest = lastmod
+            yield url
+
+    @property
+    def last_modified(self) -> Union[datetime, None]:
+        """The latest lastmod of the URLs iterated so far, or None if there is none"""
+        return parse_lastmod(self.latest) if self.latest else None
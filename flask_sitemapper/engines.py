@@ -0,0 +1,146 @@
+"""Provides engines for rendering sitemaps from their templates and URLs"""
+
+from itertools import islice
+from typing import Iterable, Iterator
+
+from .extensions import NAMESPACES, UsedNamespaces
+from .templates import SITEMAP, SITEMAP_INDEX, compile_template
+from .url import URL
+
+# the start and end of the document for each template, which surround the entries for the URLs
+DOCUMENTS = {
+    SITEMAP: (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">',
+        "\n</urlset>",
+    ),
+    SITEMAP_INDEX: (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">',
+        "\n</sitemapindex>",
+    ),
+}
+
+
+def document_start(template: str, namespaces: Iterable[str] = ()) -> str:
+    """Gets the start of the document for a template, declaring the namespaces of any extensions"""
+    start = DOCUMENTS[template][0]
+    if not namespaces:
+        return start
+
+    declarations = "".join(
+        f' xmlns:{prefix}="{NAMESPACES[prefix]}"' for prefix in sorted(namespaces)
+    )
+    return f"{start[:-1]}{declarations}>"
+
+
+class JinjaEngine:
+    """Renders sitemaps using their Jinja2 templates"""
+
+    def render(self, template: str, urls: Iterable[URL]) -> str:
+        """Renders the whole sitemap to a string"""
+        if template not in DOCUMENTS:
+            return compile_template(template).render(urls=urls)
+
+        # the namespaces of extensions are only known once the entries have been rendered
+        urls = UsedNamespaces(urls)
+        entries = self.render_entries(template, urls)
+        return document_start(template, urls.namespaces) + entries + DOCUMENTS[template][1]
+
+    def render_entries(self, template: str, urls: Iterable[URL]) -> str:
+        """Renders only the entries for `urls`, without the start and end of the document"""
+        start, end = DOCUMENTS[template]
+        return compile_template(template).render(urls=urls)[len(start) : -len(end)]
+
+    def stream(
+        self, template: str, urls: Iterable[URL], buffer_size: int, namespaces: Iterable[str] = ()
+    ) -> Iterator[str]:
+        """Lazily renders the sitemap, yielding chunks of about `buffer_size` output events
+
+        The namespaces of extensions must be given, as the start of the document is sent first.
+        """
+        chunks = compile_template(template).stream(urls=urls)
+        chunks.enable_buffering(buffer_size)
+        if not namespaces or template not in DOCUMENTS:
+            yield from chunks
+            return
+
+        # the first chunk begins with the start of the document
+        start = DOCUMENTS[template][0]
+        for chunk in chunks:
+            yield document_start(template, namespaces) + chunk[len(start) :]
+            break
+        yield from chunks
+
+
+class WriterEngine:
+    """Writes sitemaps directly from precomputed tag fragments, without the overhead of Jinja2
+
+    Produces the same output as `JinjaEngine`, which is used for any template the writer does not
+    know the entries of.
+    """
+
+    # the start and end of each entry for each template
+    ENTRIES = {
+        SITEMAP: ("\n  <url>\n    <loc>", "\n  </url>"),
+        SITEMAP_INDEX: ("\n  <sitemap>\n    <loc>", "\n  </sitemap>"),
+    }
+
+    def __init__(self) -> None:
+        self.fallback = JinjaEngine()
+
+    def render(self, template: str, urls: Iterable[URL]) -> str:
+        """Renders the whole sitemap to a string"""
+        if template not in self.ENTRIES:
+            return self.fallback.render(template, urls)
+
+        urls = UsedNamespaces(urls)
+        entries = self.render_entries(template, urls)
+        return document_start(template, urls.namespaces) + entries + DOCUMENTS[template][1]
+
+    def render_entries(self, template: str, urls: Iterable[URL]) -> str:
+        """Renders only the entries for `urls`, without the start and end of the document"""
+        if template not in self.ENTRIES:
+            return self.fallback.render_entries(template, urls)
+
+        return "".join(self.__iter_entries(urls, *self.ENTRIES[template]))
+
+    def stream(
+        self, template: str, urls: Iterable[URL], buffer_size: int, namespaces: Iterable[str] = ()
+    ) -> Iterator[str]:
+        """Lazily renders the sitemap, yielding chunks of `buffer_size` entries
+
+        The namespaces of extensions must be given, as the start of the document is sent first.
+        """
+        if template not in self.ENTRIES:
+            yield from self.fallback.stream(template, urls, buffer_size, namespaces)
+            return
+
+        end = DOCUMENTS[template][1]
+        yield document_start(template, namespaces)
+        entries = self.__iter_entries(urls, *self.ENTRIES[template])
+        while True:
+            chunk = "".join(islice(entries, buffer_size))
+            if not chunk:
+                break
+            yield chunk
+        yield end
+
+    @staticmethod
+    def __iter_entries(urls: Iterable[URL], entry_start: str, entry_end: str) -> Iterator[str]:
+        """Yields the XML of each URL's entry, matching the lines of `URL.xml`"""
+        for url in urls:
+            entry = f"{entry_start}{url.loc}</loc>"
+            if url.lastmod:
+                entry += f"\n    <lastmod>{url.lastmod}</lastmod>"
+            if url.changefreq:
+                entry += f"\n    <changefreq>{url.changefreq}</changefreq>"
+            if url.priority:
+                entry += f"\n    <priority>{url.priority}</priority>"
+            for extension in url.extensions:
+                entry += "\n    " + "\n    ".join(extension.xml)
+            yield entry + entry_end
+
+
+# engines which may be selected by name
+ENGINES = {"jinja": JinjaEngine(), "writer": WriterEngine()}
@@ -0,0 +1,169 @@
+"""Provides elements for Google's sitemap extensions, which add images, videos, news, and alternate
+language versions to the entries of a sitemap
+"""
+
+from datetime import datetime
+from typing import Iterable, Iterator, Union
+
+from .url import URL
+
+# the namespace of each extension, keyed by the prefix of its elements
+NAMESPACES = {
+    "image": "http://www.google.com/schemas/sitemap-image/1.1",
+    "news": "http://www.google.com/schemas/sitemap-news/0.9",
+    "video": "http://www.google.com/schemas/sitemap-video/1.1",
+    "xhtml": "http://www.w3.org/1999/xhtml",
+}
+
+
+def escape(value: str) -> str:
+    """Escapes text or a double quoted attribute value, faster than `xml.sax.saxutils`"""
+    return (
+        value.replace("&", "&amp;")
+        .replace("<", "&lt;")
+        .replace(">", "&gt;")
+        .replace('"', "&quot;")
+    )
+
+
+def w3c_datetime(value: Union[str, datetime]) -> str:
+    """Formats datetimes like `URL` does for lastmod, leaving strings as they are"""
+    return value.strftime("%Y-%m-%dT%H:%M:%S") if isinstance(value, datetime) else value
+
+
+class Alternate:
+    """A link to a version of the page for another language or region"""
+
+    namespace = "xhtml"
+    __slots__ = ("hreflang", "href")
+
+    def __init__(self, hreflang: str, href: str) -> None:
+        self.hreflang = hreflang
+        self.href = href
+
+    @property
+    def xml(self) -> list:
+        """Generates a list of XML lines for this element"""
+        return [
+            f'<xhtml:link rel="alternate" hreflang="{escape(self.hreflang)}" '
+            f'href="{escape(self.href)}"/>'
+        ]
+
+
+class Image:
+    """An image on the page"""
+
+    namespace = "image"
+    __slots__ = ("loc",)
+
+    def __init__(self, loc: str) -> None:
+        self.loc = loc
+
+    @property
+    def xml(self) -> list:
+        """Generates a list of XML lines for this element"""
+        return ["<image:image>", f"  <image:loc>{escape(self.loc)}</image:loc>", "</image:image>"]
+
+
+class Video:
+    """A video on the page, which needs either `content_loc` or `player_loc`"""
+
+    namespace = "video"
+    __slots__ = (
+        "thumbnail_loc",
+        "title",
+        "description",
+        "content_loc",
+        "player_loc",
+        "duration",
+        "publication_date",
+    )
+
+    def __init__(
+        self,
+        thumbnail_loc: str,
+        title: str,
+        description: str,
+        content_loc: str = None,
+        player_loc: str = None,
+        duration: int = None,
+        publication_date: Union[str, datetime] = None,
+    ) -> None:
+        self.thumbnail_loc = thumbnail_loc
+        self.title = title
+        self.description = description
+        self.content_loc = content_loc
+        self.player_loc = player_loc
+        self.duration = duration
+        self.publication_date = publication_date
+
+    @property
+    def xml(self) -> list:
+        """Generates a list of XML lines for this element"""
+        xml_lines = [
+            "<video:video>",
+            f"  <video:thumbnail_loc>{escape(self.thumbnail_loc)}</video:thumbnail_loc>",
+            f"  <video:title>{escape(self.title)}</video:title>",
+            f"  <video:description>{escape(self.description)}</video:description>",
+        ]
+        if self.content_loc:
+            xml_lines.append(
+                f"  <video:content_loc>{escape(self.content_loc)}</video:content_loc>"
+            )
+        if self.player_loc:
+            xml_lines.append(f"  <video:player_loc>{escape(self.player_loc)}</video:player_loc>")
+        if self.duration is not None:
+            xml_lines.append(f"  <video:duration>{self.duration}</video:duration>")
+        if self.publication_date:
+            date = w3c_datetime(self.publication_date)
+            xml_lines.append(f"  <video:publication_date>{date}</video:publication_date>")
+        xml_lines.append("</video:video>")
+        return xml_lines
+
+
+class News:
+    """A news article on the page"""
+
+    namespace = "news"
+    __slots__ = ("publication_name", "language", "publication_date", "title")
+
+    def __init__(
+        self,
+        publication_name: str,
+        language: str,
+        publication_date: Union[str, datetime],
+        title: str,
+    ) -> None:
+        self.publication_name = publication_name
+        self.language = language
+        self.publication_date = publication_date
+        self.title = title
+
+    @property
+    def xml(self) -> list:
+        """Generates a list of XML lines for this element"""
+        return [
+            "<news:news>",
+            "  <news:publication>",
+            f"    <news:name>{escape(self.publication_name)}</news:name>",
+            f"    <news:language>{escape(self.language)}</news:language>",
+            "  </news:publication>",
+            f"  <news:publication_date>{w3c_datetime(self.publication_date)}"
+            "</news:publication_date>",
+            f"  <news:title>{escape(self.title)}</news:title>",
+            "</news:news>",
+        ]
+
+
+class UsedNamespaces:
+    """Wraps an iterable of URLs, finding the prefixes of their extensions as they are iterated"""
+
+    def __init__(self, urls: Iterable[URL]) -> None:
+        self.urls = urls
+        self.namespaces = set()
+
+    def __iter__(self) -> Iterator[URL]:
+        for url in self.urls:
+            if url.extensions:
+                self.namespaces.update(extension.namespace for extension in url.extensions)
+            yield url
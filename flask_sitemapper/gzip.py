@@ -1,35 +1,54 @@
-"""Provides the `gzip_response` function for compressing Flask `Response` objects"""
+"""Provides functions for compressing data, responses, and response streams with gzip"""
 
+import zlib
 from gzip import GzipFile
 from io import BytesIO
+from typing import Iterable, Iterator, Union
 
 from flask import Response, request
 
 
+def accepts_gzip() -> bool:
+    """Checks whether the client of the current request accepts gzip encoded responses"""
+    # respects q-values, so gzip;q=0 is not accepted
+    return request.accept_encodings.quality("gzip") > 0
+
+
 def gzip_response(response: Response) -> Response:
-    """Compresses a Flask `Response` using gzip"""
-    # get accepted encodings request header
-    accept_encoding = request.headers.get("Accept-Encoding", "").lower()
-
-    # return unedited response if it should not be gzipped
-    if (
-        response.status_code < 200
-        or response.status_code >= 300
-        or "gzip" not in accept_encoding
-        or "Content-Encoding" in response.headers
-    ):
+    """Compresses a Flask `Response` using gzip, if the client accepts it
+
+    Kept for compatibility, as `compression.compress_response` supports other encodings too.
+    """
+    # imported here, as the compression module imports this one
+    from .compression import compress_response
+
+    if not accepts_gzip():
         return response
+    return compress_response(response, "gzip", 6)
+
 
-    # avoid issues with direct_passthrough
-    response.direct_passthrough = False
+def gzip_stream(chunks: Iterable[Union[str, bytes]], compresslevel: int = 6) -> Iterator[bytes]:
+    """Incrementally compresses an iterable of chunks using gzip, yielding compressed chunks"""
+    # wbits of 31 produces a gzip header and trailer rather than a raw zlib stream
+    compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8")
 
-    # gzip the response
+        # the compressor buffers internally, so only yield when it produces output
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+
+    yield compressor.flush()
+
+
+def gzip_compress(data: bytes, compresslevel: int = 6) -> bytes:
+    """Compresses bytes using gzip"""
     gzip_buffer = BytesIO()
-    gzip_file = GzipFile(mode="wb", compresslevel=6, fileobj=gzip_buffer)
-    gzip_file.write(response.get_data())
-    gzip_file.close()
-    response.set_data(gzip_buffer.getvalue())
-    response.headers["Content-Encoding"] = "gzip"
-    response.headers["Content-Length"] = response.content_length
-
-    return response
+
+    # a fixed mtime makes the output the same for the same data
+    with GzipFile(mode="wb", compresslevel=compresslevel, fileobj=gzip_buffer, mtime=0) as file:
+        file.write(data)
+
+    return gzip_buffer.getvalue()
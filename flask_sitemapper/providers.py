@@ -0,0 +1,110 @@
+"""Provides the `Paginator` class for lazily loading URL variables from paginated sources, and the
+`LastmodTracker` class for loading only the lastmods which have changed
+"""
+
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Callable, Hashable, Iterator, Union
+
+
+class Paginator:
+    """Loads sets of URL variables for a dynamic route one page at a time, such as from a database
+
+    `fetch` is called with an offset and a limit, and returns an iterable of dicts of URL variables.
+    If `key` is provided, keyset pagination is used instead, and `fetch` is called with the value
+    of the `key` URL variable for the last row of the previous page (None for the first page).
+    """
+
+    def __init__(
+        self,
+        fetch: Callable,
+        count: Callable = None,
+        page_size: int = 1000,
+        key: str = None,
+    ) -> None:
+        self.fetch = fetch
+        self.count_function = count
+        self.page_size = page_size
+        self.key = key
+
+    def count(self) -> int:
+        """The total number of rows, paging through every row if no count function is provided"""
+        if self.count_function:
+            return self.count_function()
+        return sum(1 for _ in self.iter_rows())
+
+    def iter_rows(self, start: int = 0, stop: int = None) -> Iterator[dict]:
+        """Lazily yields dicts of URL variables, or a slice of them, fetching a page at a time"""
+        if self.key is None:
+            yield from self.__iter_offset_rows(start, stop)
+        else:
+            yield from self.__iter_keyset_rows(start, stop)
+
+    def __iter_offset_rows(self, start: int, stop: int = None) -> Iterator[dict]:
+        """Fetches pages by offset, so a slice only fetches the pages it covers"""
+        offset = start
+        while stop is None or offset < stop:
+            limit = self.page_size if stop is None else min(self.page_size, stop - offset)
+            page = list(self.fetch(offset, limit))
+            yield from page
+
+            # a short page means there are no more rows
+            if len(page) < limit:
+                return
+            offset += limit
+
+    def __iter_keyset_rows(self, start: int, stop: int = None) -> Iterator[dict]:
+        """Fetches pages after the key of the last row, skipping rows before the slice"""
+        after = None
+        position = 0
+        while stop is None or position < stop:
+            page = list(self.fetch(after, self.page_size))
+
+            # yield only the rows of the page which fall within the slice
+            for row in page:
+                if position >= start and (stop is None or position < stop):
+                    yield row
+                position += 1
+
+            # a short page means there are no more rows
+            if len(page) < self.page_size:
+                return
+            after = page[-1][self.key]
+
+
+class LastmodTracker:
+    """Keeps the lastmod of each set of URL variables, loading only those changed since last time
+
+    `changed` is called with the time of the previous load as an aware UTC datetime (None for the
+    first load), and returns an iterable of (url variables, lastmod) pairs for the rows changed
+    since then. If `key` is provided, rows are identified by the value of that URL variable,
+    otherwise by all of their URL variables.
+    """
+
+    def __init__(self, changed: Callable, key: str = None) -> None:
+        self.changed = changed
+        self.key = key
+
+        # lastmods keyed by row, and the time they were last loaded
+        self.lastmods = {}
+        self.since = None
+        self.lock = Lock()
+
+    def row_key(self, url_variables: dict) -> Hashable:
+        """Gets the key identifying the row for a set of URL variables"""
+        if self.key is not None:
+            return url_variables[self.key]
+        return tuple(sorted(url_variables.items()))
+
+    def load(self) -> None:
+        """Applies the lastmods of the rows changed since the previous load"""
+        with self.lock:
+            # taken before loading, so rows changed while loading are loaded again next time
+            now = datetime.now(timezone.utc)
+            for url_variables, lastmod in self.changed(self.since):
+                self.lastmods[self.row_key(url_variables)] = lastmod
+            self.since = now
+
+    def get(self, url_variables: dict) -> Union[str, datetime, None]:
+        """Gets the lastmod for a set of URL variables, or None if none has been loaded"""
+        return self.lastmods.get(self.row_key(url_variables))
@@ -0,0 +1,102 @@
+"""Provides the `Refresher` class for rebuilding cached sitemaps in background threads"""
+
+from contextlib import contextmanager
+from threading import Condition, Event, Lock, Thread
+from typing import Callable, Hashable, Iterable, Iterator
+
+
+class Refresher:
+    """Rebuilds cached sitemaps in background threads, and stops concurrent rebuilds of a key
+
+    `rebuild` is called with a cache key, and should render and cache the sitemap for that key.
+    """
+
+    def __init__(self, rebuild: Callable) -> None:
+        self.rebuild = rebuild
+
+        # a lock for each cache key held while its sitemap is built, with the number of threads
+        # holding or waiting for it, so it is removed once unused rather than kept for every host
+        self.locks = {}
+        self.locks_lock = Lock()
+
+        # keys which are being rebuilt in the background, and those to rebuild again afterwards
+        self.pending = set()
+        self.restarted = set()
+        self.condition = Condition()
+
+        # whether a thread refreshing keys on a schedule has been started, and whether to stop it
+        self.scheduled = False
+        self.stopped = Event()
+
+    @contextmanager
+    def lock(self, key: Hashable) -> Iterator[None]:
+        """Holds the lock for `key` while its sitemap is built"""
+        with self.locks_lock:
+            entry = self.locks.get(key)
+            if entry is None:
+                entry = self.locks[key] = [Lock(), 0]
+            entry[1] += 1
+
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self.locks_lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self.locks[key]
+
+    def refresh(self, key: Hashable, restart: bool = False) -> None:
+        """Starts rebuilding the sitemap for `key` in a background thread, unless it already is
+
+        If `restart` is True, a rebuild which is already running is followed by another, as it may
+        have used outdated data.
+        """
+        with self.condition:
+            if key in self.pending:
+                if restart:
+                    self.restarted.add(key)
+                return
+            self.pending.add(key)
+
+        Thread(target=self.__run, args=(key,), daemon=True).start()
+
+    def wait(self, timeout: float = None) -> bool:
+        """Waits for all background rebuilds to finish, returning False if `timeout` is reached"""
+        with self.condition:
+            return self.condition.wait_for(lambda: not self.pending, timeout)
+
+    def schedule(self, interval: float, keys: Callable) -> None:
+        """Refreshes every key returned by `keys` each `interval` seconds, starting only once"""
+        with self.condition:
+            if self.scheduled:
+                return
+            self.scheduled = True
+
+        Thread(target=self.__run_schedule, args=(interval, keys), daemon=True).start()
+
+    def stop(self) -> None:
+        """Stops refreshing keys on a schedule"""
+        self.stopped.set()
+
+    def __run(self, key: Hashable) -> None:
+        """Rebuilds the sitemap for `key` while holding its lock, until it is not restarted"""
+        try:
+            while True:
+                with self.lock(key):
+                    self.rebuild(key)
+
+                with self.condition:
+                    if key not in self.restarted:
+                        break
+                    self.restarted.discard(key)
+        finally:
+            with self.condition:
+                self.pending.discard(key)
+                self.condition.notify_all()
+
+    def __run_schedule(self, interval: float, keys: Callable[[], Iterable[Hashable]]) -> None:
+        """Refreshes every key each `interval` seconds, until stopped"""
+        while not self.stopped.wait(interval):
+            for key in keys():
+                self.refresh(key)
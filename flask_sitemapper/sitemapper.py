@@ -1,26 +1,113 @@
 """Provides the `Sitemapper` class"""
 
+import os
+from asyncio import gather
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
 from datetime import datetime
-from functools import wraps
-from inspect import unwrap
-from typing import Callable, Union
+from functools import partial, wraps
+from inspect import iscoroutinefunction, unwrap
+from itertools import islice
+from math import ceil
+from mmap import mmap
+from time import time
+from typing import Callable, Iterable, Iterator, Tuple, Union
+
+from flask import (
+    Flask,
+    Response,
+    abort,
+    current_app,
+    has_app_context,
+    has_request_context,
+    request,
+    send_file,
+    stream_with_context,
+)
+from flask.globals import request_ctx
+from werkzeug.http import is_resource_modified
+
+from .cache import CachedSitemap, SharedCache, XMLCache
+from .changes import diff, fingerprint
+from .compression import (
+    FAST_LEVELS,
+    available_encodings,
+    compress,
+    compress_response,
+    negotiate_encoding,
+)
+from .conditional import LastModified, parse_lastmod
+from .engines import DOCUMENTS, ENGINES, document_start
+from .extensions import NAMESPACES, UsedNamespaces
+from .gzip import accepts_gzip, gzip_stream
+from .providers import LastmodTracker, Paginator
+from .refresh import Refresher
+from .static import remove_shards, shard_filename, write_sitemap
+from .templates import SITEMAP, SITEMAP_INDEX
+from .url import LOADED, URL, DynamicEndpoint
 
-from flask import Flask, Response
-from jinja2 import BaseLoader, Environment
+# the maximum number of URLs allowed in a single sitemap by the sitemap protocol
+MAX_URLS = 50000
 
-from .gzip import gzip_response
-from .templates import SITEMAP, SITEMAP_INDEX
-from .url import URL, DynamicEndpoint
+# the number of template output events or entries to buffer into each chunk of a streamed sitemap
+STREAM_BUFFER_SIZE = 512
+
+# the number of bytes in each chunk of a response served from a memory mapped sitemap
+MAPPED_CHUNK_SIZE = 256 * 1024
+
+# the placeholder host sitemaps shared between hosts are rendered for, replaced with each request's
+SHARED_HOST = "sitemapper.invalid"
 
 
 class Sitemapper:
     """The main class for this extension which manages and creates a sitemap"""
 
-    def __init__(self, app: Flask = None, https: bool = True, master: bool = False) -> None:
+    def __init__(
+        self,
+        app: Flask = None,
+        https: bool = True,
+        master: bool = False,
+        cache_ttl: float = None,
+        cache_size: int = 32,
+        cache_store: object = None,
+        gzip_level: int = 9,
+        br_level: int = 9,
+        zstd_level: int = 10,
+        encodings: Iterable[str] = None,
+        cache_control: str = None,
+        stale_while_revalidate: bool = False,
+        refresh_interval: float = None,
+        max_workers: int = None,
+        on_change: Callable = None,
+        share_hosts: bool = False,
+        shard_size: int = None,
+        shard_url: str = "/sitemap-<int:shard>.xml",
+        shard_endpoint: str = "sitemap_shard",
+        engine: Union[str, object] = "jinja",
+        static_directory: str = None,
+        static_filename: str = "sitemap.xml",
+    ) -> None:
         # process and store provided arguments
         self.scheme = "https" if https else "http"
         self.template = SITEMAP_INDEX if master else SITEMAP
 
+        # split large sitemaps into shards listed by a sitemap index, within the protocol limit
+        self.shard_size = min(shard_size, MAX_URLS) if shard_size and not master else None
+        self.shard_url = shard_url
+        self.shard_endpoint = shard_endpoint
+
+        # the engine rendering the sitemap, given by name or as an object with the same render and
+        # stream methods, and optionally render_entries
+        if isinstance(engine, str):
+            if engine not in ENGINES:
+                raise ValueError(f"{engine} is not a sitemap engine, use one of {list(ENGINES)}")
+            engine = ENGINES[engine]
+        self.engine = engine
+
+        # serve files written by build_static from this directory, if they exist
+        self.static_directory = os.path.abspath(static_directory) if static_directory else None
+        self.static_filename = static_filename
+
         # list of URL objects to list in the sitemap
         self.urls = []
 
@@ -30,9 +117,65 @@ class Sitemapper:
         # list of functions to run after extension initialization
         self.deferred_functions = []
 
-        # store the finished XML for the sitemap
+        # whether any endpoint has elements of sitemap extensions
+        self.extended = False
+
+        # endpoint names keyed by their unwrapped view functions, extended as views are registered
+        self.endpoint_index = {}
+        self.indexed_endpoints = set()
+
+        # store the finished XML for the sitemap, keyed by the request's URL root
         self.cache_xml = True
-        self.cached_xml = None
+        self.cache_ttl = cache_ttl
+        if cache_store is not None:
+            # share the XML between processes, so only one of them renders it
+            self.cache = SharedCache(cache_store, cache_ttl, cache_size)
+        else:
+            self.cache = XMLCache(cache_ttl, cache_size)
+
+        # serve expired or invalidated XML while it is rebuilt in the background, and optionally
+        # rebuild all cached XML on a schedule
+        self.stale_while_revalidate = stale_while_revalidate or refresh_interval is not None
+        self.refresh_interval = refresh_interval
+        self.refresher = Refresher(self.__rebuild)
+
+        # render dynamic endpoints concurrently in a thread pool, so their url_variables and lastmod
+        # functions can wait on databases or APIs at the same time
+        self.executor = ThreadPoolExecutor(max_workers, "sitemapper") if max_workers else None
+
+        # store the rendered entries for each dynamic endpoint, so that only expired or changed
+        # parts are rendered again when the whole XML is not cached
+        self.fragments = XMLCache(cache_ttl, cache_size)
+
+        # static URLs never change for a host, so their URLs are built and their entries rendered
+        # once and kept without expiry, keyed by the request's URL root (and template)
+        self.static_urls = XMLCache(None, cache_size)
+        self.static_entries = XMLCache(None, cache_size)
+
+        # called with the URLs which changed each time the sitemap is built again, comparing it to
+        # fingerprints of the previous build of the whole sitemap, keyed by the request's URL root
+        self.on_change = on_change
+        self.fingerprints = XMLCache(None, cache_size)
+
+        # render the XML once for all hosts and splice in each request's host, for apps serving
+        # many domains whose routes do not depend on the host
+        self.share_hosts = share_hosts
+        self.shared = XMLCache(cache_ttl, cache_size)
+
+        # the generation of a shared cache which the in-process caches above were rendered for,
+        # which changes when any process invalidates the sitemap
+        self.generation = None
+
+        # content encodings to compress responses with, if their libraries are installed
+        self.encodings = available_encodings(encodings)
+
+        # cached XML is compressed once, so it can afford higher compression levels, though the
+        # highest brotli and zstd levels take too long for large sitemaps
+        self.gzip_level = gzip_level
+        self.compression_levels = {"gzip": gzip_level, "br": br_level, "zstd": zstd_level}
+
+        # the Cache-Control header for sitemap responses, such as "public, max-age=3600"
+        self.cache_control = cache_control
 
         # initialize the extension if the app argument is provided, otherwise, set self.app to None
         self.app = None
@@ -43,6 +186,12 @@ class Sitemapper:
         """A conventional interface allowing initializing a Flask app later"""
         # store the app instance for use elsewhere
         self.app = app
+        self.endpoint_index = {}
+        self.indexed_endpoints = set()
+
+        # register the route serving each shard of the sitemap
+        if self.shard_size:
+            app.add_url_rule(self.shard_url, self.shard_endpoint, self.__serve_shard)
 
         # run all deferred functions
         for deferred in self.deferred_functions:
@@ -53,19 +202,39 @@ class Sitemapper:
 
     def include(
         self,
-        lastmod: Union[Callable, str, datetime, list] = None,
+        lastmod: Union[Callable, str, datetime, list, LastmodTracker] = None,
         changefreq: Union[str, list] = None,
         priority: Union[str, int, float, list] = None,
-        url_variables: Union[Callable, dict] = {},
+        url_variables: Union[Callable, dict, Iterable[dict], Paginator] = {},
+        cache_ttl: float = None,
+        version: Callable = None,
+        extensions: Union[Callable, Iterable] = None,
     ) -> Callable:
         """A decorator for view functions to add their URL to the sitemap"""
 
         # decorator that calls add_endpoint
         def decorator(func: Callable) -> Callable:
-            self.add_endpoint(func, lastmod, changefreq, priority, url_variables)
+            self.add_endpoint(
+                func, lastmod, changefreq, priority, url_variables, cache_ttl, version, extensions
+            )
+
+            # views are dispatched within an app context, so one is only pushed for direct calls,
+            # keeping coroutine views as coroutines so that Flask runs them as async views
+            if iscoroutinefunction(func):
+
+                @wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    if has_app_context():
+                        return await func(*args, **kwargs)
+                    with self.app.app_context():
+                        return await func(*args, **kwargs)
+
+                return async_wrapper
 
             @wraps(func)
             def wrapper(*args, **kwargs):
+                if has_app_context():
+                    return func(*args, **kwargs)
                 with self.app.app_context():
                     return func(*args, **kwargs)
 
@@ -75,33 +244,99 @@ class Sitemapper:
 
     def __get_endpoint_name(self, func: Callable) -> str:
         """Finds the endpoint name of a view function"""
-        # loop over all view functions, comparing function ids to find the endpoint name
-        for endpoint, view_func in self.app.view_functions.items():
-            # unwraps to compare original functions - this avoids issues with monitoring tools
-            if unwrap(func) is unwrap(view_func):
-                return endpoint
+        # unwraps to compare original functions - this avoids issues with monitoring tools
+        func = unwrap(func)
+
+        # index any view functions registered since the last lookup
+        endpoint = self.__get_indexed_endpoint(func)
+        if endpoint is None:
+            self.__index_endpoints()
+            endpoint = self.__get_indexed_endpoint(func)
+
+        # index the whole app again, as func may have replaced the view function of an endpoint
+        # which was indexed already
+        if endpoint is None:
+            self.endpoint_index.clear()
+            self.indexed_endpoints.clear()
+            self.__index_endpoints()
+            endpoint = self.__get_indexed_endpoint(func)
+
+        if endpoint is not None:
+            return endpoint
 
         # raise error if func is not registered as a view function
         raise ValueError(
             f"{func.__name__} in module {func.__module__} is not a registered view function"
         )
 
+    def __get_indexed_endpoint(self, func: Callable) -> Union[str, None]:
+        """Gets the indexed endpoint of an unwrapped view function, unless it has been replaced"""
+        endpoint = self.endpoint_index.get(func)
+        if endpoint is not None and unwrap(self.app.view_functions.get(endpoint)) is func:
+            return endpoint
+        return None
+
+    def __index_endpoints(self) -> None:
+        """Indexes the view functions registered since the last call, which are at the end of the
+        dict, keeping the first endpoint of a view function as scanning in order would
+        """
+        new_views = []
+        for endpoint, view_func in reversed(self.app.view_functions.items()):
+            if endpoint in self.indexed_endpoints:
+                break
+            new_views.append((endpoint, view_func))
+
+        for endpoint, view_func in reversed(new_views):
+            self.endpoint_index.setdefault(unwrap(view_func), endpoint)
+            self.indexed_endpoints.add(endpoint)
+
     def add_endpoint(
         self,
         view_func: Union[Callable, str],
-        lastmod: Union[Callable, str, datetime, list] = None,
+        lastmod: Union[Callable, str, datetime, list, LastmodTracker] = None,
         changefreq: Union[str, list] = None,
         priority: Union[str, int, float, list] = None,
-        url_variables: Union[Callable, dict] = {},
+        url_variables: Union[Callable, dict, Iterable[dict], Paginator] = {},
+        cache_ttl: float = None,
+        version: Callable = None,
+        extensions: Union[Callable, Iterable] = None,
     ) -> None:
-        """Adds the URL of `view_func` to the sitemap with any provided arguments"""
+        """Adds the URL of `view_func` to the sitemap with any provided arguments
+
+        For dynamic routes, the rendered URLs are cached for `cache_ttl` seconds, defaulting to the
+        sitemap's `cache_ttl`, or until `version` returns a different value if it is provided.
+        `extensions` are elements such as `Image` and `Alternate` added to every URL, or a function
+        called with each URL's variables which returns them.
+        """
+        # iterators are exhausted by the first sitemap built, so they must come from a function
+        if not isinstance(url_variables, (Callable, dict, Paginator, type(None))) and (
+            iter(url_variables) is url_variables
+        ):
+            raise TypeError(
+                "url_variables cannot be an iterator, as it can only be iterated once, use a list "
+                "or a function returning the iterator instead"
+            )
+
         # if extension is not yet initialized, register this as a deferred function and return
         if not self.app:
             self.deferred_functions.append(
-                lambda s: s.add_endpoint(view_func, lastmod, changefreq, priority, url_variables)
+                lambda s: s.add_endpoint(
+                    view_func,
+                    lastmod,
+                    changefreq,
+                    priority,
+                    url_variables,
+                    cache_ttl,
+                    version,
+                    extensions,
+                )
             )
             return
 
+        # streamed sitemaps must declare the namespaces of every extension before any entries
+        if extensions:
+            self.extended = True
+
         # get the endpoint name of view_func
         if not isinstance(view_func, str):
             endpoint = self.__get_endpoint_name(view_func)
@@ -110,45 +345,632 @@ class Sitemapper:
 
         # if url variables are provided (for dynamic routes)
         if url_variables:
-            # disable xml caching if a callable value is provided
-            if isinstance(url_variables, Callable):
+            # disable xml caching if a callable value is provided, unless the cache expires, or if
+            # this endpoint's fragment may need rendering again before the whole xml expires,
+            # unless stale xml is served while it is rebuilt
+            if not self.stale_while_revalidate and (
+                (isinstance(url_variables, Callable) and self.cache_ttl is None)
+                or cache_ttl is not None
+                or version is not None
+            ):
                 self.cache_xml = False
 
             # create a DynamicEndpoint object
             dynamic_endpoint = DynamicEndpoint(
-                endpoint, self.scheme, lastmod, changefreq, priority, url_variables
+                endpoint,
+                self.scheme,
+                lastmod,
+                changefreq,
+                priority,
+                url_variables,
+                cache_ttl,
+                version,
+                extensions,
             )
             self.dynamic_endpoints.append(dynamic_endpoint)
+
+            # keep as many fragments per endpoint as whole sitemaps
+            self.fragments.max_entries = self.cache.max_entries * len(self.dynamic_endpoints)
         else:
-            # create a URL object without url variables and append it to self.urls
-            url = URL(endpoint, self.scheme, lastmod, changefreq, priority)
+            # create a URL object without url variables and append it to self.urls, keeping any
+            # extensions function until the URL is built for a host
+            url = URL(endpoint, self.scheme, lastmod, changefreq, priority, extensions=extensions)
             self.urls.append(url)
+            self.__clear_static()
+
+    @property
+    def endpoints(self) -> set:
+        """The names of all endpoints included in the sitemap"""
+        endpoints = {url.endpoint for url in self.urls}
+        endpoints.update(dynamic_endpoint.endpoint for dynamic_endpoint in self.dynamic_endpoints)
+        return endpoints
+
+    def invalidate(self, endpoint: Union[Callable, str] = None) -> None:
+        """Clears the cached XML, or only the XML which includes `endpoint` if it is provided"""
+        if endpoint is not None:
+            # get the endpoint name if a view function is provided
+            if not isinstance(endpoint, str):
+                endpoint = self.__get_endpoint_name(endpoint)
+
+            # nothing is cached for endpoints which are not in this sitemap
+            if endpoint not in self.endpoints:
+                return
+
+            if endpoint in {url.endpoint for url in self.urls}:
+                self.__clear_static()
+            self.fragments.clear(lambda key: key[1].endpoint == endpoint)
+        else:
+            self.__clear_static()
+            self.fragments.clear()
 
-    def generate(self, gzip: bool = False) -> Response:
-        """Creates a Flask `Response` object for the XML sitemap"""
+        # the xml shared between hosts includes every endpoint
+        self.shared.clear()
 
-        # check for cached xml
-        if self.cache_xml and self.cached_xml:
-            xml = self.cached_xml
+        # other processes sharing the cache clear their own caches before rendering again
+        self.cache.new_generation()
+
+        # keep serving the invalidated xml until it is rebuilt, if enabled
+        if self.stale_while_revalidate:
+            self.cache.expire()
+            for key in self.cache.keys():
+                self.refresher.refresh(key, restart=True)
         else:
-            # get all urls for the sitemap
-            urls = self.urls.copy()
+            self.cache.clear()
+
+    def count(self) -> int:
+        """The number of URLs in the sitemap"""
+        return len(self.urls) + sum(d.count() for d in self.dynamic_endpoints)
+
+    def iter_urls(self, start: int = 0, stop: int = None, counts: list = None) -> Iterator[URL]:
+        """Lazily yields the URL objects for the sitemap, or for a slice of them
+
+        `counts` are the numbers of URLs of each dynamic endpoint, if they have been counted already.
+        """
+        yield from islice(self.__get_static_urls(), start, stop)
+
+        # avoid counting dynamic endpoint URLs when no slice is taken
+        if not start and stop is None:
             for dynamic_endpoint in self.dynamic_endpoints:
-                urls += dynamic_endpoint.urls
+                yield from dynamic_endpoint.iter_urls()
+            return
 
-            # create the final xml document
-            template = Environment(loader=BaseLoader).from_string(self.template)
-            xml = template.render(urls=urls)
+        # translate the slice into a slice of each dynamic endpoint's URLs
+        position = len(self.urls)
+        for i, dynamic_endpoint in enumerate(self.dynamic_endpoints):
+            if stop is not None and position >= stop:
+                return
+
+            count = dynamic_endpoint.count() if counts is None else counts[i]
+            if position + count > start:
+                yield from dynamic_endpoint.iter_urls(
+                    max(start - position, 0), None if stop is None else stop - position
+                )
+            position += count
+
+    def generate(self, gzip: bool = False, stream: bool = False, shard: int = None) -> Response:
+        """Creates a Flask `Response` object for the XML sitemap, streamed if `stream` is True
+
+        If `gzip` is True, the response is compressed with the encoding the client prefers out of
+        gzip, and brotli or zstd if installed. Streamed responses and static files only use gzip.
+        Responses have an ETag and a Last-Modified date, unless streamed, and are answered with a
+        304 if the client's copy is still valid.
+        """
+        # serve pre-generated files if they have been built
+        if self.static_directory:
+            response = self.__send_static(gzip, shard)
+            if response is not None:
+                return self.__add_cache_control(response)
+
+        # url_for output depends on the host and scheme of the request, so these key the cache
+        cache_key = (request.url_root if has_request_context() else None, shard)
 
-            # cache the xml if enabled
-            if self.cache_xml:
-                self.xml = xml
+        # check for cached xml
+        cached = self.__get_cached(cache_key) if self.cache_xml else None
+
+        if cached is None:
+            # stream the sitemap as it is rendered if it is not already cached
+            if stream:
+                template, urls = self.__get_contents(shard)
+                return self.__add_cache_control(self.__stream(template, urls, gzip))
+
+            # compress the response for this request only if caching is disabled
+            if not self.cache_xml:
+                template, urls = self.__get_contents(shard)
+                xml, last_modified = self.__render(template, urls, shard)
+                self.__publish(cache_key, template, xml)
+                response = Response(xml, content_type="application/xml")
+                if gzip:
+                    encoding = negotiate_encoding(self.encodings)
+                    if encoding:
+                        response = compress_response(response, encoding, FAST_LEVELS[encoding])
+                    response.vary.add("Accept-Encoding")
+                response.add_etag()
+                return self.__make_conditional(response, last_modified)
+
+            # only one request builds the xml, while others wait for it, including those served by
+            # other processes if the cache is shared
+            with self.refresher.lock(cache_key), self.cache.build_lock(cache_key):
+                cached = self.cache.get(cache_key)
+                if cached is None:
+                    template, urls = self.__get_contents(shard)
+                    cached = self.__build(cache_key, template, urls, shard)
+
+        response = self.__cached_response(cache_key, cached, gzip)
+        if response is None:
+            # another process replaced or cleared the shared xml after it was found
+            return self.generate(gzip, stream, shard)
+        return response
 
-        # create a flask response
-        response = Response(xml, content_type="application/xml")
+    async def agenerate(self, gzip: bool = False, shard: int = None) -> Response:
+        """Creates a Flask `Response` object for the XML sitemap, for use in async views
+
+        Async url_variables, lastmod, and version functions are awaited concurrently, rather than
+        each being run in its own event loop as `generate` does.
+        """
+        # url_for output depends on the host and scheme of the request, so these key the cache
+        cache_key = (request.url_root if has_request_context() else None, shard)
+
+        # cached xml is served without running any functions, including stale xml if it is rebuilt
+        # in the background, where async functions do not share this thread's event loop
+        if self.cache_xml:
+            if self.stale_while_revalidate:
+                cached = self.cache.get_stale(cache_key)[0]
+            else:
+                cached = self.cache.get(cache_key)
+            if cached is not None:
+                return self.generate(gzip, shard=shard)
+
+        loaded = await gather(*(d.load_async() for d in self.dynamic_endpoints))
+        token = LOADED.set(dict(zip(self.dynamic_endpoints, loaded)))
+        try:
+            return self.generate(gzip, shard=shard)
+        finally:
+            LOADED.reset(token)
+
+    def __get_cached(self, cache_key: Tuple) -> Union[CachedSitemap, None]:
+        """Gets the cached XML, which may be stale and rebuilt in the background if enabled"""
+        if not self.stale_while_revalidate:
+            return self.cache.get(cache_key)
+
+        # start the schedule on the first request, so it runs in the process serving requests
+        if self.refresh_interval is not None:
+            self.refresher.schedule(self.refresh_interval, self.cache.keys)
+
+        cached, fresh = self.cache.get_stale(cache_key)
+        if cached is not None and not fresh:
+            self.refresher.refresh(cache_key)
+        return cached
+
+    def __rebuild(self, cache_key: Tuple) -> None:
+        """Rebuilds the cached XML for a cache key, keeping the stale XML if this fails"""
+        url_root, shard = cache_key
+        requested = time()
+        try:
+            with self.cache.build_lock(cache_key), self.app.test_request_context(
+                base_url=url_root
+            ):
+                # another process sharing the cache may have rebuilt the xml meanwhile
+                if self.cache.updated_since(cache_key, requested):
+                    return
+                template, urls = self.__get_contents(shard)
+                self.__build(cache_key, template, urls, shard)
+        except Exception:
+            self.app.logger.exception("Failed to rebuild the sitemap, serving the stale sitemap")
+
+    def __build(
+        self, cache_key: Tuple, template: str, urls: Iterator[URL], shard: int = None
+    ) -> CachedSitemap:
+        """Renders the XML and caches it, with compressed copies added when first requested"""
+        xml, last_modified = self.__render(template, urls, shard)
+        cached = CachedSitemap(xml.encode("utf-8"), last_modified)
+        self.cache.set(cache_key, cached)
+        self.__publish(cache_key, template, xml)
+        return cached
+
+    def __publish(self, cache_key: Tuple, template: str, xml: str) -> None:
+        """Passes the changes since the previous build of the XML to `on_change`, if provided
+
+        Nothing is passed for the first build, as there is nothing to compare it to. Sharded
+        sitemaps are compared as a whole when the index of shards is built, rendering the entries
+        of every shard, as adding or removing a URL moves others into neighbouring shards.
+        """
+        url_root, shard = cache_key
+        if self.on_change is None or shard is not None:
+            return
+
+        if template is not self.template:
+            xml, _ = self.__render(self.template, self.iter_urls())
+
+        current = fingerprint(xml)
+        previous = self.fingerprints.get(url_root)
+        self.fingerprints.set(url_root, current)
+        if previous is None:
+            return
+
+        changes = diff(previous, current)
+        if changes.added or changes.removed or changes.modified:
+            try:
+                self.on_change(changes)
+            except Exception:
+                self.app.logger.exception("Failed to handle the changes to the sitemap")
+
+    def __render(
+        self, template: str, urls: Iterator[URL], shard: int = None
+    ) -> Tuple[str, datetime]:
+        """Renders the XML, returning it and the latest lastmod of the URLs"""
+        self.__check_generation()
+        if (
+            self.share_hosts
+            and has_request_context()
+            and request.host != SHARED_HOST
+            and not self.app.url_map.host_matching
+        ):
+            return self.__render_shared(shard)
+
+        # use cached fragments unless only a shard or the index of shards is rendered, as their
+        # URLs do not line up with the fragments
+        if shard is None and template is self.template:
+            return self.__render_fragments(template)
+
+        urls = LastModified(urls)
+        return self.engine.render(template, urls), urls.last_modified
+
+    def __check_generation(self) -> None:
+        """Clears the in-process caches if a process sharing the cache invalidated the sitemap"""
+        generation = self.cache.generation()
+        if generation != self.generation:
+            self.__clear_static()
+            self.fragments.clear()
+            self.shared.clear()
+            self.generation = generation
+
+    def __render_shared(self, shard: int = None) -> Tuple[str, datetime]:
+        """Renders the XML for a placeholder host, or gets it from the cache, and adds the host
+
+        Returns the XML and the latest lastmod of the URLs.
+        """
+        key = (SHARED_HOST, request.script_root, shard)
+        with self.refresher.lock(key):
+            rendered = self.shared.get(key) if self.cache_xml else None
+            if rendered is None:
+                base_url = f"http://{SHARED_HOST}{request.script_root}/"
+                with self.app.test_request_context(base_url=base_url):
+                    template, urls = self.__get_contents(shard)
+                    rendered = self.__render(template, urls, shard)
+                if self.cache_xml:
+                    self.shared.set(key, rendered)
+
+        xml, last_modified = rendered
+        return xml.replace(f"://{SHARED_HOST}", f"://{request.host}"), last_modified
+
+    def __render_fragments(self, template: str) -> Tuple[str, datetime]:
+        """Renders the whole sitemap by joining the fragments of its static and dynamic URLs
+
+        Returns the XML and the latest lastmod of the URLs.
+        """
+        url_root = request.url_root if has_request_context() else None
+        get_fragment = partial(self.__get_fragment, template, url_root)
+        fragments = [get_fragment()]
+
+        # results are kept in the order the endpoints were added, so the output is the same
+        if self.executor and len(self.dynamic_endpoints) > 1:
+            get_fragment = self.__with_context(get_fragment)
+            fragments.extend(self.executor.map(get_fragment, self.dynamic_endpoints))
+        else:
+            fragments.extend(map(get_fragment, self.dynamic_endpoints))
+
+        # declare the namespaces of the extensions used by any fragment
+        namespaces = set().union(*(namespaces for _, _, namespaces in fragments))
+        start, end = document_start(template, namespaces), DOCUMENTS[template][1]
+        xml = start + "".join(entries for entries, _, _ in fragments) + end
+        latest = max((lastmod for _, lastmod, _ in fragments if lastmod), default=None)
+        return xml, parse_lastmod(latest) if latest else None
+
+    @staticmethod
+    def __with_context(func: Callable) -> Callable:
+        """Wraps `func` to run in a new copy of the current request context, or an app context"""
+        # each call needs its own context, as a context can only be pushed in one thread at once
+        if has_request_context():
+            new_context = request_ctx._get_current_object().copy
+        else:
+            new_context = current_app._get_current_object().app_context
+
+        # pool threads do not inherit context variables, such as the values loaded by agenerate
+        variables = copy_context()
+
+        def run(*args, **kwargs):
+            with new_context():
+                return func(*args, **kwargs)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            return variables.copy().run(run, *args, **kwargs)
+
+        return wrapper
+
+    def __get_fragment(
+        self, template: str, url_root: str, dynamic_endpoint: DynamicEndpoint = None
+    ) -> Tuple[str, str, frozenset]:
+        """Gets the entries, latest lastmod, and namespaces used for a dynamic endpoint, or for the
+        static URLs
+
+        The entries are only rendered if they are not cached, or if their version has changed.
+        """
+        if dynamic_endpoint is None:
+            return self.__get_static_entries(template, url_root)
+
+        if dynamic_endpoint.cacheable:
+            key = (url_root, dynamic_endpoint, dynamic_endpoint.get_version())
+        else:
+            key = None
+
+        fragment = self.fragments.get(key) if key else None
+        if fragment is None:
+            urls = LastModified(dynamic_endpoint.iter_urls())
+            used = UsedNamespaces(urls)
+            ttl = dynamic_endpoint.cache_ttl
+
+            # fragments expire with the whole xml unless the endpoint has its own expiry
+            entries = self.__render_entries(template, used)
+            fragment = (entries, urls.latest, frozenset(used.namespaces))
+            if key:
+                self.fragments.set(key, fragment, self.cache.ttl if ttl is None else ttl)
+
+        return fragment
+
+    def __get_static_urls(self) -> list:
+        """Gets the static URLs with their locations built for the current host"""
+        url_root = request.url_root if has_request_context() else None
+        urls = self.static_urls.get(url_root)
+        if urls is None:
+            urls = [
+                URL(
+                    url.endpoint,
+                    url.scheme,
+                    url.lastmod,
+                    url.changefreq,
+                    url.priority,
+                    loc=url.loc,
+                    extensions=tuple(
+                        url.extensions(url.url_variables)
+                        if callable(url.extensions)
+                        else url.extensions or ()
+                    ),
+                )
+                for url in self.urls
+            ]
+            self.static_urls.set(url_root, urls)
+        return urls
+
+    def __get_static_entries(self, template: str, url_root: str) -> Tuple[str, str, frozenset]:
+        """Gets the rendered entries, latest lastmod, and namespaces used of the static URLs for
+        the current host
+        """
+        key = (url_root, template)
+        fragment = self.static_entries.get(key)
+        if fragment is None:
+            urls = LastModified(self.__get_static_urls())
+            used = UsedNamespaces(urls)
+            entries = self.__render_entries(template, used)
+            fragment = (entries, urls.latest, frozenset(used.namespaces))
+            self.static_entries.set(key, fragment)
+        return fragment
+
+    def __render_entries(self, template: str, urls: UsedNamespaces) -> str:
+        """Renders only the entries for `urls`, cutting them out of the whole document for engines
+        without a `render_entries` method
+        """
+        render_entries = getattr(self.engine, "render_entries", None)
+        if render_entries is not None:
+            return render_entries(template, urls)
+
+        # the namespaces declared at the start are only known once the entries have been rendered
+        xml = self.engine.render(template, urls)
+        start, end = document_start(template, urls.namespaces), DOCUMENTS[template][1]
+        return xml[len(start) : -len(end)]
+
+    def __clear_static(self) -> None:
+        """Clears the built static URLs and their rendered entries for every host"""
+        self.static_urls.clear()
+        self.static_entries.clear()
+
+    def __cached_response(
+        self, cache_key: Tuple, cached: CachedSitemap, gzip: bool
+    ) -> Union[Response, None]:
+        """Creates a Flask `Response` from cached XML, compressing it once per content encoding
+
+        Only the negotiated encoding is loaded, and none for a 304. Returns None if a shared cache
+        removed the XML after it was found.
+        """
+        encoding = negotiate_encoding(self.encodings) if gzip else None
+
+        # each encoding of the sitemap needs a different strong ETag
+        etag = cached.etag if encoding is None else f"{cached.etag}-{encoding}"
+
+        if self.__not_modified(etag, cached.last_modified):
+            data = b""
+        else:
+            data = self.__get_encoding(cache_key, cached, encoding or "identity")
+            if data is None:
+                return None
+
+        response = self.__buffer_response(data)
+        response.set_etag(etag)
+        if encoding is not None:
+            response.headers["Content-Encoding"] = encoding
+
+        # the response depends on Accept-Encoding if it could have been compressed
+        if gzip:
+            response.vary.add("Accept-Encoding")
+
+        return self.__make_conditional(response, cached.last_modified)
+
+    def __get_encoding(
+        self, cache_key: Tuple, cached: CachedSitemap, encoding: str
+    ) -> Union[bytes, mmap, None]:
+        """Gets one encoding of cached XML, loading it from the cache or compressing it once"""
+        data = self.__load_encoding(cache_key, cached, encoding)
+        if data is not None or encoding == "identity":
+            return data
+
+        # only one request compresses each encoding, while others for it wait and reuse it
+        with self.refresher.lock((*cache_key, encoding)):
+            data = self.__load_encoding(cache_key, cached, encoding)
+            if data is None:
+                xml = self.__load_encoding(cache_key, cached, "identity")
+                if xml is None:
+                    return None
+                level = self.compression_levels[encoding]
+                data = cached.encodings[encoding] = compress(xml, encoding, level)
+                self.cache.add_encoding(cache_key, cached, encoding)
+        return data
+
+    def __load_encoding(
+        self, cache_key: Tuple, cached: CachedSitemap, encoding: str
+    ) -> Union[bytes, mmap, None]:
+        """Gets one encoding of cached XML if it is held in memory or stored, or None"""
+        encodings = cached.encodings
+        if encoding not in encodings:
+            data = self.cache.get_encoding(cache_key, cached, encoding)
+            if data is None:
+                return None
+            encodings[encoding] = data
+        return encodings[encoding]
+
+    @staticmethod
+    def __not_modified(etag: str, last_modified: datetime = None) -> bool:
+        """Checks whether the request's validators match, so the response will be a 304"""
+        return (
+            has_request_context()
+            and request.method in ("GET", "HEAD")
+            and not is_resource_modified(request.environ, etag=etag, last_modified=last_modified)
+        )
+
+    @staticmethod
+    def __buffer_response(data: Union[bytes, mmap]) -> Response:
+        """Creates a Flask `Response` for XML bytes, or a memory map which is served in chunks
 
-        # gzip the response if desired
+        Slicing the map copies only one chunk at a time into the process, rather than the whole
+        sitemap, and the chunks keep the map open until the response is sent.
+        """
+        if isinstance(data, bytes):
+            return Response(data, content_type="application/xml")
+
+        chunks = (data[i : i + MAPPED_CHUNK_SIZE] for i in range(0, len(data), MAPPED_CHUNK_SIZE))
+        response = Response(chunks, content_type="application/xml", direct_passthrough=True)
+        response.content_length = len(data)
+        return response
+
+    def __make_conditional(self, response: Response, last_modified: datetime = None) -> Response:
+        """Adds Last-Modified and Cache-Control headers, making it a 304 if valid"""
+        response.last_modified = last_modified
+        self.__add_cache_control(response)
+
+        # compare the validators to the request's If-None-Match and If-Modified-Since headers
+        if has_request_context():
+            response.make_conditional(request)
+        return response
+
+    def __add_cache_control(self, response: Response) -> Response:
+        """Sets the configured Cache-Control header on a response"""
+        if self.cache_control:
+            response.headers["Cache-Control"] = self.cache_control
+        return response
+
+    def __get_contents(self, shard: int = None) -> Tuple[str, Iterator[URL]]:
+        """Gets the template and the URLs for the sitemap, or for one of its shards"""
+        if not self.shard_size:
+            return self.template, self.iter_urls()
+
+        # count the URLs of each dynamic endpoint once, for both the number of shards and the slice
+        counts = [dynamic_endpoint.count() for dynamic_endpoint in self.dynamic_endpoints]
+
+        # serve a sitemap index listing every shard once the URLs no longer fit in one sitemap
+        shards = ceil((len(self.urls) + sum(counts)) / self.shard_size)
+        if shard is None:
+            if shards <= 1:
+                return self.template, self.iter_urls()
+
+            urls = (
+                URL(self.shard_endpoint, self.scheme, url_variables={"shard": n})
+                for n in range(1, shards + 1)
+            )
+            return SITEMAP_INDEX, urls
+
+        # shards are numbered from 1
+        if not 1 <= shard <= shards:
+            abort(404)
+
+        start = (shard - 1) * self.shard_size
+        return self.template, self.iter_urls(start, start + self.shard_size, counts)
+
+    def build_static(self, directory: str = None, base_url: str = None) -> None:
+        """Atomically writes the sitemap and any shards to files, along with gzipped copies
+
+        URLs are built for `base_url`, or for the `SERVER_NAME` config if it is not provided. Files
+        are written to `directory`, or to `static_directory` which `generate` serves them from.
+        """
+        directory = os.path.abspath(directory or self.static_directory)
+        os.makedirs(directory, exist_ok=True)
+
+        with self.app.test_request_context(base_url=base_url):
+            shards = ceil(self.count() / self.shard_size) if self.shard_size else 0
+
+            # write the shards before the sitemap index listing them
+            if shards > 1:
+                for shard in range(1, shards + 1):
+                    self.__write_static(directory, shard)
+            self.__write_static(directory)
+
+        remove_shards(directory, self.static_filename, shards if shards > 1 else 0)
+
+    def __write_static(self, directory: str, shard: int = None) -> None:
+        """Renders the sitemap, or one of its shards, to a file and a gzipped file"""
+        template, urls = self.__get_contents(shard)
+        path = os.path.join(directory, shard_filename(self.static_filename, shard))
+        xml = self.engine.render(template, urls)
+        write_sitemap(path, xml)
+        self.__publish((request.url_root, shard), template, xml)
+
+    def __send_static(self, gzip: bool, shard: int = None) -> Union[Response, None]:
+        """Sends the pre-generated file for the sitemap or one of its shards, if it exists"""
+        path = os.path.join(self.static_directory, shard_filename(self.static_filename, shard))
+
+        # send_file uses X-Sendfile or the server's file wrapper, avoiding copying the file
+        if gzip and accepts_gzip() and os.path.isfile(f"{path}.gz"):
+            response = send_file(f"{path}.gz", mimetype="application/xml")
+            response.headers["Content-Encoding"] = "gzip"
+        elif os.path.isfile(path):
+            response = send_file(path, mimetype="application/xml")
+        else:
+            return None
+
+        # the response depends on Accept-Encoding if it could have been compressed
         if gzip:
-            response = gzip_response(response)
+            response.vary.add("Accept-Encoding")
+        return response
+
+    def __serve_shard(self, shard: int) -> Response:
+        """The view function for shards of the sitemap, which are gzipped if the client accepts it"""
+        return self.generate(gzip=True, shard=shard)
 
+    def __stream(self, template: str, urls: Iterator[URL], gzip: bool) -> Response:
+        """Creates a streamed Flask `Response` which renders the sitemap in chunks"""
+        # buffer output so that each chunk covers multiple URLs
+        namespaces = NAMESPACES if self.extended else ()
+        chunks = self.engine.stream(template, urls, STREAM_BUFFER_SIZE, namespaces)
+
+        # keep the request context available while the response is iterated
+        chunks = stream_with_context(chunks)
+
+        # compress the stream incrementally if desired
+        if gzip and accepts_gzip():
+            response = Response(gzip_stream(chunks), content_type="application/xml")
+            response.headers["Content-Encoding"] = "gzip"
+        else:
+            response = Response(chunks, content_type="application/xml")
+
+        # the response depends on Accept-Encoding if it could have been compressed
+        if gzip:
+            response.vary.add("Accept-Encoding")
         return response
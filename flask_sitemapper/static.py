@@ -0,0 +1,45 @@
+"""Provides functions for writing pre-generated sitemap files to disk"""
+
+import gzip
+import os
+import re
+from tempfile import NamedTemporaryFile
+
+
+def shard_filename(filename: str, shard: int = None) -> str:
+    """Gets the filename of a shard of a sitemap, or of the sitemap itself if `shard` is None"""
+    if shard is None:
+        return filename
+    stem, extension = os.path.splitext(filename)
+    return f"{stem}-{shard}{extension}"
+
+
+def write_atomic(path: str, data: bytes) -> None:
+    """Writes `data` to `path` through a temporary file, so readers never see a partial file"""
+    # the temporary file must be on the same filesystem for the rename to be atomic
+    file = NamedTemporaryFile(dir=os.path.dirname(path), delete=False)
+    try:
+        with file:
+            file.write(data)
+        os.chmod(file.name, 0o644)
+        os.replace(file.name, path)
+    except BaseException:
+        os.remove(file.name)
+        raise
+
+
+def write_sitemap(path: str, xml: str) -> None:
+    """Atomically writes a sitemap file and a gzipped copy of it"""
+    data = xml.encode("utf-8")
+    write_atomic(f"{path}.gz", gzip.compress(data, compresslevel=9, mtime=0))
+    write_atomic(path, data)
+
+
+def remove_shards(directory: str, filename: str, keep: int) -> None:
+    """Removes files for shards of a sitemap numbered above `keep`, left over from older builds"""
+    stem, extension = os.path.splitext(filename)
+    pattern = re.compile(rf"{re.escape(stem)}-(\d+){re.escape(extension)}(\.gz)?")
+    for name in os.listdir(directory):
+        match = pattern.fullmatch(name)
+        if match and int(match.group(1)) > keep:
+            os.remove(os.path.join(directory, name))
@@ -0,0 +1,248 @@
+"""Provides key-value stores which share cached sitemaps between processes
+
+A store needs the subset of the redis-py client interface used by `SharedCache`, so a Redis
+client can be used as a store directly:
+
+* `get(name)` returns the bytes stored under `name`, or None
+* `set(name, value)` stores bytes under `name`
+* `delete(*names)` removes any of `names` which exist
+* `scan_iter(match)` yields the names matching a glob pattern, as str or bytes
+* `lock(name, timeout)` returns a context manager holding a lock shared by every process, which
+  is released after `timeout` seconds if its holder dies
+"""
+
+import os
+import sqlite3
+from contextlib import closing, contextmanager
+from fnmatch import fnmatchcase
+from mmap import ACCESS_READ, mmap
+from threading import Event, Thread
+from time import sleep, time
+from typing import Callable, Iterator, Union
+from uuid import uuid4
+
+from .static import write_atomic
+
+# seconds to wait between attempts to acquire a lock held by another process
+LOCK_POLL_INTERVAL = 0.05
+
+
+@contextmanager
+def poll_lock(
+    acquire: Callable[[], bool],
+    release: Callable[[], None],
+    refresh: Callable[[], bool],
+    timeout: float,
+) -> Iterator[None]:
+    """Holds a lock by calling `acquire` until it succeeds, releasing it afterwards
+
+    While the lock is held, `refresh` is called every `timeout / 2` seconds until it returns False,
+    so that slow builds are not taken over as if their process had died.
+    """
+    while not acquire():
+        sleep(LOCK_POLL_INTERVAL)
+
+    released = Event()
+
+    def keep_alive() -> None:
+        while not released.wait(timeout / 2) and refresh():
+            pass
+
+    Thread(target=keep_alive, daemon=True).start()
+    try:
+        yield
+    finally:
+        released.set()
+        release()
+
+
+class FilesystemStore:
+    """Stores each value in a file in `directory`, so stored sitemaps can be read like any file
+
+    If `memory_map` is True, values are read as read-only memory maps of their files instead of
+    being copied into each process, so workers share one copy in the page cache. Files are replaced
+    atomically, so existing maps keep the previous value.
+    """
+
+    def __init__(self, directory: str, memory_map: bool = False) -> None:
+        self.directory = os.path.abspath(directory)
+        self.memory_map = memory_map
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, name: str) -> str:
+        """Gets the path of the file for `name`"""
+        if os.sep in name or (os.altsep and os.altsep in name):
+            raise ValueError(f"{name} is not a valid name for a file")
+        return os.path.join(self.directory, name)
+
+    def get(self, name: str) -> Union[bytes, mmap, None]:
+        try:
+            with open(self.path(name), "rb") as file:
+                # empty files cannot be mapped
+                if self.memory_map and os.fstat(file.fileno()).st_size:
+                    return mmap(file.fileno(), 0, access=ACCESS_READ)
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def set(self, name: str, value: bytes) -> None:
+        write_atomic(self.path(name), value)
+
+    def delete(self, *names: str) -> None:
+        for name in names:
+            try:
+                os.remove(self.path(name))
+            except FileNotFoundError:
+                pass
+
+    def scan_iter(self, match: str = "*") -> Iterator[str]:
+        for name in os.listdir(self.directory):
+            if fnmatchcase(name, match):
+                yield name
+
+    def lock(self, name: str, timeout: float = 60):
+        """Holds a lock file, taking it over if it has not been touched for `timeout` seconds
+
+        The holder touches the file while it holds the lock, and only removes the file if it still
+        holds its token. Stale files are replaced rather than removed, so a process cannot remove
+        a lock file which another process has just created.
+        """
+        path = self.path(f"{name}.lock")
+        token = uuid4().hex.encode()
+
+        def read_token() -> Union[bytes, None]:
+            try:
+                with open(path, "rb") as file:
+                    return file.read()
+            except FileNotFoundError:
+                return None
+
+        def take_over(stale: bytes) -> bool:
+            claim = f"{path}.{token.decode()}"
+            with open(claim, "wb") as file:
+                file.write(token)
+
+            # only replace the file if no other process has taken it over since it was read
+            if read_token() != stale:
+                os.remove(claim)
+                return False
+            os.replace(claim, path)
+
+            # another process taking over the same file at once may have replaced it again
+            sleep(LOCK_POLL_INTERVAL)
+            return read_token() == token
+
+        def acquire() -> bool:
+            try:
+                descriptor = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                pass
+            else:
+                with os.fdopen(descriptor, "wb") as file:
+                    file.write(token)
+                return True
+
+            # take over lock files left by processes which died while holding them
+            try:
+                with open(path, "rb") as file:
+                    held = file.read()
+                    stale = os.fstat(file.fileno()).st_mtime < time() - timeout
+            except FileNotFoundError:
+                return False
+            return stale and take_over(held)
+
+        def refresh() -> bool:
+            if read_token() != token:
+                return False
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                return False
+            return True
+
+        def release() -> None:
+            if read_token() == token:
+                self.delete(f"{name}.lock")
+
+        return poll_lock(acquire, release, refresh, timeout)
+
+
+class SQLiteStore:
+    """Stores values in an SQLite database at `path`, which processes on one host may share"""
+
+    def __init__(self, path: str) -> None:
+        self.database = path
+        with self.connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS sitemapper (name TEXT PRIMARY KEY, value BLOB)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS sitemapper_locks "
+                "(name TEXT PRIMARY KEY, token TEXT, expires REAL)"
+            )
+
+    @contextmanager
+    def connect(self) -> Iterator[sqlite3.Connection]:
+        """Opens a connection for one transaction, as connections cannot be shared by threads"""
+        with closing(sqlite3.connect(self.database, timeout=30)) as connection:
+            with connection:
+                yield connection
+
+    def get(self, name: str) -> Union[bytes, None]:
+        with self.connect() as connection:
+            row = connection.execute(
+                "SELECT value FROM sitemapper WHERE name = ?", (name,)
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def set(self, name: str, value: bytes) -> None:
+        with self.connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO sitemapper (name, value) VALUES (?, ?)", (name, value)
+            )
+
+    def delete(self, *names: str) -> None:
+        with self.connect() as connection:
+            connection.executemany(
+                "DELETE FROM sitemapper WHERE name = ?", [(name,) for name in names]
+            )
+
+    def scan_iter(self, match: str = "*") -> Iterator[str]:
+        with self.connect() as connection:
+            rows = connection.execute(
+                "SELECT name FROM sitemapper WHERE name GLOB ?", (match,)
+            ).fetchall()
+        return (name for name, in rows)
+
+    def lock(self, name: str, timeout: float = 60):
+        """Holds a lock row, taking it over if it has not been refreshed for `timeout` seconds"""
+        token = uuid4().hex
+
+        def acquire() -> bool:
+            now = time()
+            with self.connect() as connection:
+                connection.execute(
+                    "DELETE FROM sitemapper_locks WHERE name = ? AND expires < ?", (name, now)
+                )
+                cursor = connection.execute(
+                    "INSERT OR IGNORE INTO sitemapper_locks (name, token, expires) "
+                    "VALUES (?, ?, ?)",
+                    (name, token, now + timeout),
+                )
+            return cursor.rowcount == 1
+
+        def refresh() -> bool:
+            with self.connect() as connection:
+                cursor = connection.execute(
+                    "UPDATE sitemapper_locks SET expires = ? WHERE name = ? AND token = ?",
+                    (time() + timeout, name, token),
+                )
+            return cursor.rowcount == 1
+
+        def release() -> None:
+            with self.connect() as connection:
+                connection.execute(
+                    "DELETE FROM sitemapper_locks WHERE name = ? AND token = ?", (name, token)
+                )
+
+        return poll_lock(acquire, release, refresh, timeout)
@@ -1,5 +1,9 @@
 """Provides Jinja2 templates for the sitemap and sitemap index"""
 
+from functools import lru_cache
+
+from jinja2 import BaseLoader, Environment, Template
+
 SITEMAP = """<?xml version="1.0" encoding="utf-8"?>
 <urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
   {%- for url in urls %}
@@ -21,3 +25,13 @@ SITEMAP_INDEX = """<?xml version="1.0" encoding="utf-8"?>
   </sitemap>
   {%- endfor %}
 </sitemapindex>"""
+
+# a single environment shared by all Sitemapper instances
+# the app's jinja_env is not reused as it autoescapes templates created from strings
+ENVIRONMENT = Environment(loader=BaseLoader(), autoescape=False)
+
+
+@lru_cache(maxsize=None)
+def compile_template(source: str) -> Template:
+    """Compiles a template source string once, returning the same `Template` on later calls"""
+    return ENVIRONMENT.from_string(source)
@@ -1,14 +1,37 @@
-"""Provides the `URL` class"""
+"""Provides the `URL` class and classes for building URLs for dynamic routes"""
 
+from asyncio import gather
+from contextvars import ContextVar
 from datetime import datetime
-from typing import Callable, Union
+from inspect import iscoroutinefunction
+from itertools import islice
+from sys import intern
+from typing import Callable, Hashable, Iterable, Iterator, Tuple, Union
 
-from flask import current_app, url_for
+from flask import current_app, has_request_context, url_for
+from flask.globals import app_ctx, request_ctx
+
+from .providers import LastmodTracker, Paginator
+
+# values of async url_variables and lastmod functions, awaited ahead of rendering by agenerate
+LOADED = ContextVar("flask_sitemapper.loaded", default={})
 
 
 class URL:
     """Manages a single URL for the sitemap and its arguments"""
 
+    # avoid a __dict__ per instance, as dynamic endpoints may create very many URLs
+    __slots__ = (
+        "endpoint",
+        "scheme",
+        "lastmod",
+        "changefreq",
+        "priority",
+        "url_variables",
+        "extensions",
+        "_loc",
+    )
+
     def __init__(
         self,
         endpoint,
@@ -17,14 +40,24 @@ class URL:
         changefreq: str = None,
         priority: Union[str, int, float] = None,
         url_variables: dict = {},
+        loc: str = None,
+        extensions: tuple = (),
     ) -> None:
         self.endpoint = endpoint
         self.scheme = scheme
         self.lastmod = lastmod
-        self.changefreq = changefreq
-        self.priority = priority
         self.url_variables = url_variables
 
+        # elements of sitemap extensions, such as images and alternate language versions
+        self.extensions = extensions
+
+        # share one string object between URLs with the same changefreq or priority
+        self.changefreq = intern(changefreq) if isinstance(changefreq, str) else changefreq
+        self.priority = intern(str(priority)) if priority else priority
+
+        # a prebuilt URL, if it has already been built in bulk
+        self._loc = loc
+
         # convert datetime lastmod to str
         if isinstance(self.lastmod, datetime):
             self.lastmod = self.lastmod.strftime("%Y-%m-%dT%H:%M:%S")
@@ -32,6 +65,8 @@ class URL:
     @property
     def loc(self) -> str:
         """Finds the URL from the endpoint name. Must be called within a request context"""
+        if self._loc is not None:
+            return self._loc
         return url_for(self.endpoint, _external=True, _scheme=self.scheme, **self.url_variables)
 
     @property
@@ -44,9 +79,86 @@ class URL:
             xml_lines.append(f"<changefreq>{self.changefreq}</changefreq>")
         if self.priority:
             xml_lines.append(f"<priority>{self.priority}</priority>")
+        for extension in self.extensions:
+            xml_lines.extend(extension.xml)
         return xml_lines
 
 
+class URLBuilder:
+    """Builds external URLs for one endpoint in bulk, giving the same results as `url_for`
+
+    The endpoint's werkzeug `Rule` and the scheme and host prefix are resolved once, so building
+    each URL only formats its variables with the rule's compiled builder. Falls back to `url_for`
+    whenever the shortcut could differ from it, such as when `url_defaults` functions are used.
+    Must be created within a request context, or an app context if `SERVER_NAME` is set.
+    """
+
+    def __init__(self, endpoint: str, scheme: str) -> None:
+        self.endpoint = endpoint
+        self.scheme = scheme
+
+        # url_for uses the request's URL adapter if there is one, otherwise the app context's
+        self.adapter = request_ctx.url_adapter if has_request_context() else app_ctx.url_adapter
+        self.rule = self.__get_rule()
+
+        # maps domain parts of built rules to the scheme, host, and script root of the URL
+        self.prefixes = {}
+
+        # check the shortcut against url_for on the first URL built
+        self.verified = False
+
+    def __get_rule(self):
+        """Gets the endpoint's only rule if URLs can be built from it directly, otherwise None"""
+        # url_defaults functions may change the values passed to url_for
+        if self.adapter is None or any(current_app.url_default_functions.values()):
+            return None
+
+        # rule selection depends on the values and method for endpoints with multiple rules
+        self.adapter.map.update()
+        rules = list(self.adapter.map.iter_rules(self.endpoint))
+        if len(rules) != 1 or rules[0].websocket:
+            return None
+
+        return rules[0]
+
+    def build(self, url_variables: dict) -> str:
+        """Builds the external URL for a set of URL variables"""
+        if self.rule is None:
+            return url_for(self.endpoint, _external=True, _scheme=self.scheme, **url_variables)
+
+        # werkzeug ignores values of None
+        values = {k: v for k, v in url_variables.items() if v is not None}
+
+        # fall back to url_for if this rule can't build these values, so errors are the same
+        built = None
+        if self.rule.suitable_for(values, "GET"):
+            built = self.rule.build(values)
+        if built is None:
+            return url_for(self.endpoint, _external=True, _scheme=self.scheme, **url_variables)
+
+        domain_part, path = built
+        prefix = self.prefixes.get(domain_part)
+        if prefix is None:
+            prefix = self.prefixes[domain_part] = self.__get_prefix(domain_part)
+        loc = f"{prefix}/{path.lstrip('/')}"
+
+        # stop using the shortcut if it does not match url_for
+        if not self.verified:
+            expected = url_for(self.endpoint, _external=True, _scheme=self.scheme, **url_variables)
+            if loc != expected:
+                self.rule = None
+                return expected
+            self.verified = True
+
+        return loc
+
+    def __get_prefix(self, domain_part: str) -> str:
+        """Gets the scheme, host, and script root of URLs, as `MapAdapter.build` does"""
+        scheme = "https" if self.scheme in {"https", "wss"} else "http"
+        host = self.adapter.get_host(domain_part)
+        return f"{scheme}://{host}{self.adapter.script_name[:-1]}"
+
+
 class DynamicEndpoint:
     """Manages URLs for endpoints using URL variables / dynamic routes"""
 
@@ -54,10 +166,13 @@ class DynamicEndpoint:
         self,
         endpoint,
         scheme: str,
-        lastmod: Union[Callable, str, datetime, list] = None,
+        lastmod: Union[Callable, str, datetime, list, LastmodTracker] = None,
         changefreq: Union[str, datetime, list] = None,
         priority: Union[str, int, float, list] = None,
-        url_variables: Union[Callable, dict] = {},
+        url_variables: Union[Callable, dict, Iterable[dict], Paginator] = {},
+        cache_ttl: float = None,
+        version: Callable = None,
+        extensions: Union[Callable, Iterable] = None,
     ) -> None:
         self.endpoint = endpoint
         self.scheme = scheme
@@ -66,35 +181,144 @@ class DynamicEndpoint:
         self.priority = priority
         self.url_variables = url_variables
 
+        # extension elements for all URLs, or a function called with each URL's variables
+        self.extensions = extensions
+
+        # seconds before the rendered fragment for this endpoint expires
+        self.cache_ttl = cache_ttl
+
+        # a function returning a value which changes whenever the URLs should be rendered again
+        self.version = version
+
+    @property
+    def cacheable(self) -> bool:
+        """Whether the rendered fragment for this endpoint may be cached"""
+        return (
+            not isinstance(self.url_variables, Callable)
+            or self.cache_ttl is not None
+            or self.version is not None
+        )
+
+    def get_version(self) -> Hashable:
+        """Gets the current version of this endpoint's URLs, or None if it is not versioned"""
+        if self.version is None:
+            return None
+
+        # use the value of an async version function if it has already been awaited
+        loaded = LOADED.get().get(self, {})
+        if "version" in loaded:
+            return loaded["version"]
+
+        with current_app.app_context():
+            return current_app.ensure_sync(self.version)()
+
+    async def load_async(self) -> dict:
+        """Awaits any async url_variables, lastmod, and version functions concurrently, returning
+        their values
+        """
+        names = [
+            name
+            for name in ("url_variables", "lastmod", "version")
+            if iscoroutinefunction(getattr(self, name))
+        ]
+        with current_app.app_context():
+            values = await gather(*(getattr(self, name)() for name in names))
+        loaded = dict(zip(names, values))
+
+        # the awaited url variables are iterated more than once, such as to count them
+        url_variables = loaded.get("url_variables")
+        if not isinstance(url_variables, (dict, Paginator, type(None))) and (
+            iter(url_variables) is url_variables
+        ):
+            loaded["url_variables"] = list(url_variables)
+        return loaded
+
     @property
     def urls(self) -> list:
-        if isinstance(self.url_variables, Callable):
-            # run generator function within app context to get dict
-            with current_app.app_context():
-                url_variables = self.url_variables()
-        else:
-            # if not a callable, should be a dict already
-            url_variables = self.url_variables
+        """A list of URL objects for every set of URL variables"""
+        return list(self.iter_urls())
+
+    def count(self) -> int:
+        """The number of URLs for this endpoint"""
+        url_variables = self.__get_url_variables()
+
+        # paginators may count rows without loading them
+        if isinstance(url_variables, Paginator):
+            return url_variables.count()
+
+        if isinstance(url_variables, dict):
+            return min(map(len, url_variables.values()), default=0)
+
+        # other iterables must be consumed to count them
+        return sum(1 for _ in url_variables)
+
+    def iter_urls(self, start: int = 0, stop: int = None) -> Iterator[URL]:
+        """Lazily yields a URL object for every set of URL variables, or for a slice of them"""
+        url_variables = self.__get_url_variables()
 
         # do the same for dynamic lastmod if provided
-        if isinstance(self.lastmod, Callable):
+        loaded = LOADED.get().get(self, {})
+        if "lastmod" in loaded:
+            lastmod = loaded["lastmod"]
+        elif isinstance(self.lastmod, Callable):
             with current_app.app_context():
-                lastmod = self.lastmod()
+                lastmod = current_app.ensure_sync(self.lastmod)()
         else:
             lastmod = self.lastmod
 
-        # list to store URL objects
-        urls = []
+        # trackers only load the lastmods which have changed since they were last loaded
+        if isinstance(lastmod, LastmodTracker):
+            with current_app.app_context():
+                lastmod.load()
 
-        # iterate over each set of url variables with a line of code only god understands
-        for i, v in enumerate([dict(zip(url_variables, j)) for j in zip(*url_variables.values())]):
+        # build the URLs in bulk rather than calling url_for for each one
+        builder = URLBuilder(self.endpoint, self.scheme)
+
+        # extension elements are only created as each URL is, if a function is provided
+        get_extensions = self.extensions if callable(self.extensions) else None
+        e = () if get_extensions else tuple(self.extensions or ())
+
+        for i, v in self.__iter_rows(url_variables, start, stop):
             # use sitemap args from the list if a list is provided
-            l = lastmod[i] if isinstance(lastmod, list) else lastmod
+            if isinstance(lastmod, LastmodTracker):
+                l = lastmod.get(v)
+            else:
+                l = lastmod[i] if isinstance(lastmod, list) else lastmod
             c = self.changefreq[i] if isinstance(self.changefreq, list) else self.changefreq
             p = self.priority[i] if isinstance(self.priority, list) else self.priority
+            if get_extensions:
+                e = tuple(get_extensions(v))
+
+            # create and yield the URL object
+            yield URL(self.endpoint, self.scheme, l, c, p, v, builder.build(v), e)
 
-            # create URL object and append to the list
-            url = URL(self.endpoint, self.scheme, l, c, p, v)
-            urls.append(url)
+    def __get_url_variables(self) -> Union[dict, Iterable[dict], Paginator]:
+        """Gets the URL variables, running the generator function if provided"""
+        # use the value of an async generator function if it has already been awaited
+        loaded = LOADED.get().get(self, {})
+        if "url_variables" in loaded:
+            return loaded["url_variables"]
+
+        if isinstance(self.url_variables, Callable):
+            # run generator function within app context to get dict, which needs asgiref if async
+            with current_app.app_context():
+                return current_app.ensure_sync(self.url_variables)()
+
+        # if not a callable, should be a dict, iterable of dicts, or paginator already
+        return self.url_variables
+
+    @staticmethod
+    def __iter_rows(
+        url_variables: Union[dict, Iterable[dict], Paginator], start: int, stop: int = None
+    ) -> Iterator[Tuple[int, dict]]:
+        """Lazily yields the index and dict of each set of URL variables within a slice"""
+        # paginators only fetch the pages covering the slice
+        if isinstance(url_variables, Paginator):
+            return enumerate(url_variables.iter_rows(start, stop), start)
+
+        # iterate over each set of url variables with a line of code only god understands
+        rows = url_variables
+        if isinstance(url_variables, dict):
+            rows = (dict(zip(url_variables, j)) for j in zip(*url_variables.values()))
 
-        return urls
+        return islice(enumerate(rows), start, stop)
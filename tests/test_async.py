@@ -0,0 +1,156 @@
+import asyncio
+import time
+
+import flask
+import pytest
+
+from flask_sitemapper import Sitemapper
+
+CALLS = []
+
+
+async def url_variables():
+    CALLS.append("url_variables")
+    await asyncio.sleep(0)
+    return {"user_id": [1, 2]}
+
+
+async def lastmod():
+    CALLS.append("lastmod")
+    return ["2023-01-01", "2023-02-02"]
+
+
+@pytest.fixture
+def sitemapper(request):
+    CALLS.clear()
+    return Sitemapper(**getattr(request, "param", {}))
+
+
+@pytest.fixture
+def app(sitemapper):
+    app = flask.Flask(__name__)
+    sitemapper.init_app(app)
+    app.add_url_rule("/user/<int:user_id>", "user")
+    sitemapper.add_endpoint("user", url_variables=url_variables, lastmod=lastmod)
+    return app
+
+
+@pytest.fixture
+def expected_xml():
+    return """<?xml version="1.0" encoding="utf-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <url>
+    <loc>https://localhost/user/1</loc>
+    <lastmod>2023-01-01</lastmod>
+  </url>
+  <url>
+    <loc>https://localhost/user/2</loc>
+    <lastmod>2023-02-02</lastmod>
+  </url>
+</urlset>"""
+
+
+def test_agenerate(app, sitemapper, expected_xml):
+    with app.test_request_context("/sitemap.xml"):
+        response = asyncio.run(sitemapper.agenerate())
+
+    assert response.get_data(as_text=True) == expected_xml
+    assert sorted(CALLS) == ["lastmod", "url_variables"]
+
+
+@pytest.mark.parametrize("sitemapper", [{"max_workers": 2}], indirect=True)
+def test_agenerate_concurrent(app, sitemapper, expected_xml):
+    app.add_url_rule("/about", "about")
+    sitemapper.add_endpoint("about", url_variables=lambda: {})
+
+    with app.test_request_context("/sitemap.xml"):
+        response = asyncio.run(sitemapper.agenerate())
+
+    assert response.get_data(as_text=True).startswith(expected_xml[: -len("\n</urlset>")])
+    assert sorted(CALLS) == ["lastmod", "url_variables"]
+
+
+def test_sync_generate(app, sitemapper, expected_xml):
+    pytest.importorskip("asgiref")
+
+    with app.test_request_context("/sitemap.xml"):
+        response = sitemapper.generate()
+
+    assert response.get_data(as_text=True) == expected_xml
+
+
+def test_async_view(app, sitemapper):
+    pytest.importorskip("asgiref")
+
+    @sitemapper.include()
+    @app.route("/about")
+    async def r_about():
+        return "<h1>About</h1>"
+
+    @app.route("/sitemap.xml")
+    async def r_sitemap():
+        return await sitemapper.agenerate()
+
+    client = app.test_client()
+    assert client.get("/about").data == b"<h1>About</h1>"
+    assert "https://localhost/about" in client.get("/sitemap.xml").get_data(as_text=True)
+
+
+@pytest.mark.parametrize("sitemapper", [{"cache_ttl": 0.1}], indirect=True)
+def test_async_view_expired(app, sitemapper, expected_xml):
+    pytest.importorskip("asgiref")
+
+    @app.route("/sitemap.xml")
+    async def r_sitemap():
+        return await sitemapper.agenerate()
+
+    client = app.test_client()
+    assert client.get("/sitemap.xml").get_data(as_text=True) == expected_xml
+
+    # expired xml is rendered again with the async functions awaited first
+    time.sleep(0.15)
+    response = client.get("/sitemap.xml")
+    assert response.status_code == 200
+    assert response.get_data(as_text=True) == expected_xml
+    assert len(CALLS) == 4
+
+
+def test_async_version():
+    pytest.importorskip("asgiref")
+    sitemapper = Sitemapper()
+    app = flask.Flask(__name__)
+    sitemapper.init_app(app)
+
+    async def version():
+        return 1
+
+    app.add_url_rule("/user/<int:user_id>", "user")
+    sitemapper.add_endpoint("user", url_variables={"user_id": [1, 2]}, version=version)
+
+    @app.route("/sitemap.xml")
+    async def r_sitemap():
+        return await sitemapper.agenerate()
+
+    client = app.test_client()
+    for _ in range(2):
+        response = client.get("/sitemap.xml")
+        assert response.status_code == 200
+        assert response.get_data(as_text=True).count("<url>") == 2
+
+
+def test_agenerate_iterator():
+    sitemapper = Sitemapper(shard_size=5)
+    app = flask.Flask(__name__)
+    sitemapper.init_app(app)
+
+    async def url_variables():
+        return ({"user_id": user_id} for user_id in (1, 2))
+
+    # the awaited iterator is both counted and rendered
+    app.add_url_rule("/user/<int:user_id>", "user")
+    sitemapper.add_endpoint("user", url_variables=url_variables)
+
+    with app.test_request_context("/sitemap.xml"):
+        response = asyncio.run(sitemapper.agenerate())
+
+    assert response.get_data(as_text=True).count("<url>") == 2
@@ -0,0 +1,109 @@
+import flask
+import pytest
+
+from flask_sitemapper import Sitemapper
+
+CALLS = []
+
+
+def generate_user_ids():
+    CALLS.append(None)
+    return {"user_id": [1, 2]}
+
+
+@pytest.fixture
+def sitemapper():
+    CALLS.clear()
+    return Sitemapper(cache_ttl=60, cache_size=2)
+
+
+@pytest.fixture
+def client(sitemapper):
+    app = flask.Flask(__name__)
+    sitemapper.init_app(app)
+
+    @sitemapper.include()
+    @app.route("/")
+    def r_home():
+        return "<h1>Home</h1>"
+
+    @sitemapper.include(url_variables=generate_user_ids)
+    @app.route("/user/<int:user_id>")
+    def r_user(user_id):
+        return f"<h1>User #{user_id}</h1>"
+
+    @app.route("/admin")
+    def r_admin():
+        return "<h1>Admin</h1>"
+
+    @app.route("/sitemap.xml")
+    def r_sitemap():
+        return sitemapper.generate()
+
+    return app.test_client()
+
+
+@pytest.fixture
+def expected_xml():
+    return """<?xml version="1.0" encoding="utf-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <url>
+    <loc>https://localhost/</loc>
+  </url>
+  <url>
+    <loc>https://localhost/user/1</loc>
+  </url>
+  <url>
+    <loc>https://localhost/user/2</loc>
+  </url>
+</urlset>"""
+
+
+def test_xml(client, expected_xml):
+    response = client.get("/sitemap.xml")
+    response2 = client.get("/sitemap.xml")
+    assert response.text == expected_xml
+    assert response2.text == expected_xml
+
+
+def test_cache_hit(client):
+    client.get("/sitemap.xml")
+    client.get("/sitemap.xml")
+    assert len(CALLS) == 1
+
+
+def test_keyed_by_host(client, expected_xml):
+    client.get("/sitemap.xml")
+    response = client.get("/sitemap.xml", base_url="https://example.com")
+    assert response.text == expected_xml.replace("localhost", "example.com")
+    assert len(CALLS) == 2
+
+
+def test_max_entries(client, sitemapper):
+    for host in ("a.com", "b.com", "c.com"):
+        client.get("/sitemap.xml", base_url=f"https://{host}")
+    assert len(sitemapper.cache) == 2
+
+
+def test_ttl(client, sitemapper):
+    sitemapper.cache.ttl = 0
+    client.get("/sitemap.xml")
+    client.get("/sitemap.xml")
+    assert len(CALLS) == 2
+
+
+def test_invalidate(client, sitemapper):
+    client.get("/sitemap.xml")
+    sitemapper.invalidate()
+    client.get("/sitemap.xml")
+    assert len(CALLS) == 2
+
+
+def test_invalidate_endpoint(client, sitemapper):
+    client.get("/sitemap.xml")
+    sitemapper.invalidate("r_admin")
+    client.get("/sitemap.xml")
+    assert len(CALLS) == 1
+    sitemapper.invalidate("r_user")
+    client.get("/sitemap.xml")
+    assert len(CALLS) == 2
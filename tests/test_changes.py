@@ -0,0 +1,109 @@
+import flask
+import pytest
+
+from flask_sitemapper import Sitemapper
+from flask_sitemapper.changes import SitemapChanges, diff, fingerprint
+
+USERS = {}
+
+
+@pytest.fixture(params=[None, 60])
+def app(request):
+    USERS.clear()
+    USERS.update({1: "2023-01-01", 2: "2023-02-02"})
+
+    changes = []
+    sitemapper = Sitemapper(cache_ttl=request.param, on_change=changes.append)
+    app = flask.Flask(__name__)
+    sitemapper.init_app(app)
+
+    @sitemapper.include(
+        url_variables=lambda: {"user_id": list(USERS)}, lastmod=lambda: list(USERS.values())
+    )
+    @app.route("/user/<int:user_id>")
+    def r_user(user_id):
+        return f"<h1>User #{user_id}</h1>"
+
+    @app.route("/sitemap.xml")
+    def r_sitemap():
+        return sitemapper.generate()
+
+    app.sitemapper = sitemapper
+    app.changes = changes
+    return app
+
+
+def test_changes(app):
+    client = app.test_client()
+    client.get("/sitemap.xml")
+    assert app.changes == []
+
+    del USERS[1]
+    USERS[2] = "2023-03-03"
+    USERS[3] = "2023-04-04"
+    app.sitemapper.invalidate()
+    client.get("/sitemap.xml")
+
+    assert app.changes == [
+        SitemapChanges(
+            added={"https://localhost/user/3"},
+            removed={"https://localhost/user/1"},
+            modified={"https://localhost/user/2"},
+        )
+    ]
+
+    # unchanged sitemaps are not reported
+    app.sitemapper.invalidate()
+    client.get("/sitemap.xml")
+    assert len(app.changes) == 1
+
+
+def test_build_static(app, tmp_path):
+    app.sitemapper.build_static(str(tmp_path), "https://example.com")
+    USERS[3] = "2023-04-04"
+    app.sitemapper.build_static(str(tmp_path), "https://example.com")
+    assert app.changes == [SitemapChanges({"https://example.com/user/3"}, set(), set())]
+
+
+def test_fingerprint():
+    xml = """<urlset>
+  <url>
+    <loc>https://example.com/?a=1&amp;b=2</loc>
+    <priority>0.5</priority>
+  </url>
+  <url>
+    <loc>https://example.com/</loc>
+  </url>
+</urlset>"""
+    current = fingerprint(xml)
+    assert set(current) == {"https://example.com/?a=1&b=2", "https://example.com/"}
+
+    previous = fingerprint(xml.replace("0.5", "0.8"))
+    assert diff(previous, current) == (set(), set(), {"https://example.com/?a=1&b=2"})
+
+
+def test_sharded():
+    changes = []
+    posts = list(range(10, 20))
+    sitemapper = Sitemapper(shard_size=5, on_change=changes.append)
+    app = flask.Flask(__name__)
+    sitemapper.init_app(app)
+
+    @sitemapper.include(url_variables=lambda: {"post_id": list(posts)})
+    @app.route("/p/<int:post_id>")
+    def r_post(post_id):
+        return f"<h1>Post #{post_id}</h1>"
+
+    @app.route("/sitemap.xml")
+    def r_sitemap():
+        return sitemapper.generate()
+
+    client = app.test_client()
+    for path in ["/sitemap.xml", "/sitemap-1.xml", "/sitemap-2.xml"]:
+        client.get(path)
+
+    # URLs moved into another shard by an added URL are not reported
+    posts.insert(0, 1)
+    for path in ["/sitemap.xml", "/sitemap-1.xml", "/sitemap-2.xml", "/sitemap-3.xml"]:
+        client.get(path)
+    assert changes == [SitemapChanges({"https://localhost/p/1"}, set(), set())]
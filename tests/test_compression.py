@@ -0,0 +1,121 @@
+import gzip
+
+import flask
+import pytest
+
+from flask_sitemapper import Sitemapper
+from flask_sitemapper.compression import (
+    COMPRESSORS,
+    available_encodings,
+    negotiate_encoding,
+)
+
+
+@pytest.fixture
+def sitemapper():
+    return Sitemapper()
+
+
+@pytest.fixture
+def client(sitemapper):
+    app = flask.Flask(__name__)
+    sitemapper.init_app(app)
+
+    @sitemapper.include()
+    @app.route("/")
+    def r_home():
+        return "<h1>Home</h1>"
+
+    @app.route("/sitemap.xml")
+    def r_sitemap():
+        return sitemapper.generate(gzip=True)
+
+    return app.test_client()
+
+
+@pytest.fixture
+def expected_xml():
+    return """<?xml version="1.0" encoding="utf-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <url>
+    <loc>https://localhost/</loc>
+  </url>
+</urlset>"""
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        ("gzip", "gzip"),
+        ("gzip;q=0", None),
+        ("", None),
+        ("*", "br"),
+        ("gzip, br", "br"),
+        ("gzip, br;q=0.5", "gzip"),
+        ("br;q=0, *", "zstd"),
+        ("deflate", None),
+    ],
+)
+def test_negotiate_encoding(header, expected):
+    app = flask.Flask(__name__)
+    with app.test_request_context(headers={"Accept-Encoding": header}):
+        assert negotiate_encoding(["br", "zstd", "gzip"]) == expected
+
+
+def test_available_encodings():
+    assert available_encodings(["gzip", "unknown"]) == ["gzip"]
+    assert available_encodings([]) == []
+
+
+def test_gzip_refused(client, expected_xml):
+    response = client.get("/sitemap.xml", headers={"Accept-Encoding": "gzip;q=0"})
+    assert "Content-Encoding" not in response.headers
+    assert response.text == expected_xml
+    assert "Accept-Encoding" in response.vary
+
+
+def test_brotli(client, expected_xml):
+    brotli = pytest.importorskip("brotli")
+    response = client.get("/sitemap.xml", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["Content-Encoding"] == "br"
+    assert str(brotli.decompress(response.data), "utf-8") == expected_xml
+
+
+def test_zstd(client, expected_xml):
+    zstandard = pytest.importorskip("zstandard")
+    response = client.get("/sitemap.xml", headers={"Accept-Encoding": "zstd"})
+    assert response.headers["Content-Encoding"] == "zstd"
+    assert str(zstandard.decompress(response.data), "utf-8") == expected_xml
+
+
+def test_encoding_etags(client):
+    pytest.importorskip("brotli")
+    gzip_response = client.get("/sitemap.xml", headers={"Accept-Encoding": "gzip"})
+    br_response = client.get("/sitemap.xml", headers={"Accept-Encoding": "br"})
+    assert gzip_response.get_etag() != br_response.get_etag()
+    assert str(gzip.decompress(gzip_response.data), "utf-8").startswith("<?xml")
+
+
+@pytest.mark.parametrize("sitemapper", [Sitemapper(encodings=["gzip"])])
+def test_configured_encodings(client):
+    response = client.get("/sitemap.xml", headers={"Accept-Encoding": "br, zstd, gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+
+
+@pytest.mark.parametrize("sitemapper", [Sitemapper(encodings=[])])
+def test_no_encodings(client, expected_xml):
+    response = client.get("/sitemap.xml", headers={"Accept-Encoding": "br, zstd, gzip"})
+    assert "Content-Encoding" not in response.headers
+    assert response.text == expected_xml
+
+
+@pytest.mark.parametrize("sitemapper", [Sitemapper(br_level=1)])
+def test_br_level(client, monkeypatch):
+    pytest.importorskip("brotli")
+    levels = []
+    compressor = COMPRESSORS["br"]
+    monkeypatch.setitem(
+        COMPRESSORS, "br", lambda data, level: levels.append(level) or compressor(data, level)
+    )
+    client.get("/sitemap.xml", headers={"Accept-Encoding": "br"})
+    assert levels == [1]
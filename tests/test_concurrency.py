@@ -0,0 +1,90 @@
+import threading
+
+import flask
+import pytest
+
+from flask_sitemapper import Sitemapper
+
+THREADS = set()
+
+
+@pytest.fixture
+def parties():
+    return 1
+
+
+@pytest.fixture
+def sitemapper(request):
+    THREADS.clear()
+    return Sitemapper(**getattr(request, "param", {}))
+
+
+@pytest.fixture
+def app(sitemapper, parties):
+    app = flask.Flask(__name__)
+    sitemapper.init_app(app)
+
+    # providers wait for each other, so they must run at the same time to return
+    barrier = threading.Barrier(parties, timeout=5)
+
+    def make_provider(values):
+        def provider():
+            THREADS.add(threading.get_ident())
+            barrier.wait()
+            return {"item_id": values}
+
+        return provider
+
+    for name, values in [("first", [1, 2]), ("second", [3]), ("third", [4, 5])]:
+        app.add_url_rule(f"/{name}/<int:item_id>", name)
+        sitemapper.add_endpoint(name, url_variables=make_provider(values))
+
+    @app.route("/sitemap.xml")
+    def r_sitemap():
+        return sitemapper.generate()
+
+    return app
+
+
+@pytest.fixture
+def expected_xml():
+    return """<?xml version="1.0" encoding="utf-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <url>
+    <loc>https://localhost/first/1</loc>
+  </url>
+  <url>
+    <loc>https://localhost/first/2</loc>
+  </url>
+  <url>
+    <loc>https://localhost/second/3</loc>
+  </url>
+  <url>
+    <loc>https://localhost/third/4</loc>
+  </url>
+  <url>
+    <loc>https://localhost/third/5</loc>
+  </url>
+</urlset>"""
+
+
+def test_sequential(app, expected_xml):
+    assert app.test_client().get("/sitemap.xml").text == expected_xml
+    assert THREADS == {threading.get_ident()}
+
+
+@pytest.mark.parametrize("sitemapper", [{"max_workers": 3}], indirect=True)
+@pytest.mark.parametrize("parties", [3])
+def test_concurrent(app, expected_xml):
+    response = app.test_client().get("/sitemap.xml")
+    assert response.text == expected_xml
+    assert len(THREADS) == 3
+
+
+@pytest.mark.parametrize("sitemapper", [{"max_workers": 3}], indirect=True)
+def test_app_context(app, sitemapper):
+    app.config["SERVER_NAME"] = "example.com"
+    with app.app_context():
+        assert "<loc>https://example.com/third/5</loc>" in sitemapper.generate().get_data(
+            as_text=True
+        )
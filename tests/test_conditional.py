@@ -0,0 +1,99 @@
+from datetime import datetime, timezone
+
+import flask
+import pytest
+
+from flask_sitemapper import Sitemapper
+from flask_sitemapper.conditional import parse_lastmod
+
+
+@pytest.fixture(params=["cached", "uncached"])
+def client(request):
+    sitemapper = Sitemapper(cache_control="public, max-age=3600")
+    app = flask.Flask(__name__)
+    sitemapper.init_app(app)
+
+    # callable url variables disable caching the xml
+    user_ids = {"user_id": [1, 2, 3]}
+    url_variables = user_ids if request.param == "cached" else lambda: user_ids
+
+    @sitemapper.include(lastmod="2023-01-01")
+    @app.route("/")
+    def r_home():
+        return "<h1>Home</h1>"
+
+    @sitemapper.include(
+        url_variables=url_variables, lastmod=["2023-03-03T10:00:00", "2023-02-02", None]
+    )
+    @app.route("/user/<int:user_id>")
+    def r_user(user_id):
+        return f"<h1>User #{user_id}</h1>"
+
+    @app.route("/sitemap.xml")
+    def r_sitemap():
+        return sitemapper.generate()
+
+    @app.route("/sitemap.xml.gz")
+    def r_sitemap_gzip():
+        return sitemapper.generate(gzip=True)
+
+    @app.route("/stream.xml")
+    def r_stream():
+        return sitemapper.generate(stream=True)
+
+    return app.test_client()
+
+
+def test_headers(client):
+    response = client.get("/sitemap.xml")
+    assert response.status_code == 200
+    etag, weak = response.get_etag()
+    assert etag and not weak
+    assert response.last_modified == datetime(2023, 3, 3, 10, tzinfo=timezone.utc)
+    assert response.headers["Cache-Control"] == "public, max-age=3600"
+
+
+def test_if_none_match(client):
+    etag, _ = client.get("/sitemap.xml").get_etag()
+    response = client.get("/sitemap.xml", headers={"If-None-Match": f'"{etag}"'})
+    assert response.status_code == 304
+    assert response.data == b""
+
+    response = client.get("/sitemap.xml", headers={"If-None-Match": '"other"'})
+    assert response.status_code == 200
+
+
+def test_if_modified_since(client):
+    headers = {"If-Modified-Since": "Fri, 03 Mar 2023 10:00:00 GMT"}
+    assert client.get("/sitemap.xml", headers=headers).status_code == 304
+
+    headers = {"If-Modified-Since": "Thu, 02 Mar 2023 10:00:00 GMT"}
+    assert client.get("/sitemap.xml", headers=headers).status_code == 200
+
+
+def test_gzip_etag(client):
+    etag, _ = client.get("/sitemap.xml").get_etag()
+    response = client.get("/sitemap.xml.gz", headers={"Accept-Encoding": "gzip"})
+    assert response.get_etag()[0] != etag
+    assert "Accept-Encoding" in response.vary
+
+    headers = {"Accept-Encoding": "gzip", "If-None-Match": f'"{response.get_etag()[0]}"'}
+    assert client.get("/sitemap.xml.gz", headers=headers).status_code == 304
+
+
+def test_stream(client):
+    response = client.get("/stream.xml")
+    assert response.headers["Cache-Control"] == "public, max-age=3600"
+    assert "ETag" not in response.headers
+
+
+@pytest.mark.parametrize(
+    "lastmod, expected",
+    [
+        ("2023-01-01", datetime(2023, 1, 1)),
+        ("2023-01-01T12:30:00", datetime(2023, 1, 1, 12, 30)),
+        ("2023-01", None),
+    ],
+)
+def test_parse_lastmod(lastmod, expected):
+    assert parse_lastmod(lastmod) == expected
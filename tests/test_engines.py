@@ -0,0 +1,185 @@
+import flask
+import pytest
+
+from flask_sitemapper import Image, Sitemapper
+from flask_sitemapper.engines import JinjaEngine, WriterEngine
+from flask_sitemapper.templates import SITEMAP, SITEMAP_INDEX
+from flask_sitemapper.url import URL
+
+
+class RenderOnlyEngine:
+    """A custom engine without a render_entries method"""
+
+    def render(self, template, urls):
+        return JinjaEngine().render(template, urls)
+
+    def stream(self, template, urls, buffer_size, namespaces=()):
+        return JinjaEngine().stream(template, urls, buffer_size, namespaces)
+
+
+@pytest.fixture(params=["jinja", "writer", RenderOnlyEngine()])
+def engine(request):
+    return request.param
+
+
+@pytest.fixture
+def sitemapper(engine, request):
+    return Sitemapper(engine=engine, **getattr(request, "param", {}))
+
+
+@pytest.fixture
+def client(sitemapper):
+    app = flask.Flask(__name__)
+    sitemapper.init_app(app)
+
+    @sitemapper.include(lastmod="2022-02-01", changefreq="monthly", priority=1.0)
+    @app.route("/")
+    def r_home():
+        return "<h1>Home</h1>"
+
+    @sitemapper.include(
+        url_variables={"user_id": [1, 2, 3]},
+        lastmod=["2022-02-01", None, "2022-02-03"],
+        priority=[0.5, 0.6, 0],
+    )
+    @app.route("/user/<int:user_id>")
+    def r_user(user_id):
+        return f"<h1>User #{user_id}</h1>"
+
+    @app.route("/sitemap.xml")
+    def r_sitemap():
+        return sitemapper.generate()
+
+    @app.route("/stream.xml")
+    def r_stream():
+        return sitemapper.generate(stream=True)
+
+    return app.test_client()
+
+
+@pytest.fixture
+def expected_xml():
+    return """<?xml version="1.0" encoding="utf-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <url>
+    <loc>https://localhost/</loc>
+    <lastmod>2022-02-01</lastmod>
+    <changefreq>monthly</changefreq>
+    <priority>1.0</priority>
+  </url>
+  <url>
+    <loc>https://localhost/user/1</loc>
+    <lastmod>2022-02-01</lastmod>
+    <priority>0.5</priority>
+  </url>
+  <url>
+    <loc>https://localhost/user/2</loc>
+    <priority>0.6</priority>
+  </url>
+  <url>
+    <loc>https://localhost/user/3</loc>
+    <lastmod>2022-02-03</lastmod>
+  </url>
+</urlset>"""
+
+
+@pytest.fixture
+def expected_index_xml():
+    return """<?xml version="1.0" encoding="utf-8"?>
+<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <sitemap>
+    <loc>https://localhost/sitemap-1.xml</loc>
+  </sitemap>
+  <sitemap>
+    <loc>https://localhost/sitemap-2.xml</loc>
+  </sitemap>
+</sitemapindex>"""
+
+
+@pytest.fixture
+def expected_shard_xml():
+    return """<?xml version="1.0" encoding="utf-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <url>
+    <loc>https://localhost/user/2</loc>
+    <priority>0.6</priority>
+  </url>
+  <url>
+    <loc>https://localhost/user/3</loc>
+    <lastmod>2022-02-03</lastmod>
+  </url>
+</urlset>"""
+
+
+@pytest.mark.parametrize("path", ["/sitemap.xml", "/stream.xml"])
+def test_xml(client, path, expected_xml):
+    assert client.get(path).text == expected_xml
+
+
+@pytest.mark.parametrize("sitemapper", [{"shard_size": 2}], indirect=True)
+@pytest.mark.parametrize("path", ["/sitemap.xml", "/stream.xml"])
+def test_index(client, path, expected_index_xml):
+    assert client.get(path).text == expected_index_xml
+
+
+@pytest.mark.parametrize("sitemapper", [{"shard_size": 2}], indirect=True)
+def test_shard(client, expected_shard_xml):
+    assert client.get("/sitemap-2.xml").text == expected_shard_xml
+
+
+@pytest.mark.parametrize("template", [SITEMAP, SITEMAP_INDEX])
+def test_empty(template):
+    assert WriterEngine().render(template, []) == JinjaEngine().render(template, [])
+    assert "".join(WriterEngine().stream(template, [], 2)) == JinjaEngine().render(template, [])
+
+
+def test_stream_chunks():
+    app = flask.Flask(__name__)
+    with app.test_request_context():
+        urls = [URL("static", "https", url_variables={"filename": i}) for i in range(5)]
+        chunks = list(WriterEngine().stream(SITEMAP, urls, 2))
+        assert len(chunks) == 5
+        assert "".join(chunks) == JinjaEngine().render(SITEMAP, urls)
+
+
+def test_unknown_template():
+    template = "{% for url in urls %}{{ url.lastmod }}{% endfor %}"
+    urls = [URL("r_home", "https", lastmod="2022-02-01")]
+    assert WriterEngine().render(template, urls) == "2022-02-01"
+
+
+def test_render_only_engine():
+    def generate(engine):
+        app = flask.Flask(__name__)
+        sitemapper = Sitemapper(app, engine=engine)
+
+        @sitemapper.include(
+            url_variables={"product_id": [1, 2]},
+            extensions=lambda v: [Image(f"https://cdn.example.com/{v['product_id']}.jpg")],
+        )
+        @app.route("/product/<int:product_id>")
+        def r_product(product_id):
+            return f"<h1>Product #{product_id}</h1>"
+
+        with app.test_request_context():
+            return sitemapper.generate().data
+
+    # entries are cut out of the rendered document, after the namespaces it declares
+    assert generate(RenderOnlyEngine()) == generate("jinja")
+    assert b"xmlns:image=" in generate("jinja")
+
+
+def test_unknown_engine():
+    with pytest.raises(ValueError):
+        Sitemapper(engine="unknown")
+
+
+@pytest.mark.parametrize("template", [SITEMAP, SITEMAP_INDEX])
+def test_render_entries(template):
+    urls = [
+        URL("r_home", "https", lastmod="2022-02-01", loc=f"https://localhost/{i}")
+        for i in range(3)
+    ]
+    assert WriterEngine().render_entries(template, urls) == JinjaEngine().render_entries(
+        template, urls
+    )
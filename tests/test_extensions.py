@@ -0,0 +1,135 @@
+from datetime import datetime
+
+import flask
+import pytest
+
+from flask_sitemapper import Alternate, Image, News, Sitemapper, Video
+
+
+@pytest.fixture(params=["jinja", "writer"])
+def engine(request):
+    return request.param
+
+
+@pytest.fixture
+def sitemapper(engine, request):
+    return Sitemapper(engine=engine, **getattr(request, "param", {}))
+
+
+@pytest.fixture
+def client(sitemapper):
+    app = flask.Flask(__name__)
+    sitemapper.init_app(app)
+
+    @sitemapper.include(extensions=[Alternate("fr", "https://example.fr/")])
+    @app.route("/")
+    def r_home():
+        return "<h1>Home</h1>"
+
+    @sitemapper.include(
+        url_variables={"product_id": [1, 2]},
+        extensions=lambda v: [Image(f"https://cdn.example.com/{v['product_id']}.jpg?w=1&h=2")],
+    )
+    @app.route("/product/<int:product_id>")
+    def r_product(product_id):
+        return f"<h1>Product #{product_id}</h1>"
+
+    @sitemapper.include()
+    @app.route("/about")
+    def r_about():
+        return "<h1>About</h1>"
+
+    @app.route("/sitemap.xml")
+    def r_sitemap():
+        return sitemapper.generate()
+
+    @app.route("/stream.xml")
+    def r_stream():
+        return sitemapper.generate(stream=True)
+
+    return app.test_client()
+
+
+@pytest.fixture
+def expected_xml():
+    return """<?xml version="1.0" encoding="utf-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" \
+xmlns:image="http://www.google.com/schemas/sitemap-image/1.1" \
+xmlns:xhtml="http://www.w3.org/1999/xhtml">
+  <url>
+    <loc>https://localhost/</loc>
+    <xhtml:link rel="alternate" hreflang="fr" href="https://example.fr/"/>
+  </url>
+  <url>
+    <loc>https://localhost/about</loc>
+  </url>
+  <url>
+    <loc>https://localhost/product/1</loc>
+    <image:image>
+      <image:loc>https://cdn.example.com/1.jpg?w=1&amp;h=2</image:loc>
+    </image:image>
+  </url>
+  <url>
+    <loc>https://localhost/product/2</loc>
+    <image:image>
+      <image:loc>https://cdn.example.com/2.jpg?w=1&amp;h=2</image:loc>
+    </image:image>
+  </url>
+</urlset>"""
+
+
+def test_xml(client, expected_xml):
+    response = client.get("/sitemap.xml")
+    assert response.get_data(as_text=True) == expected_xml
+
+
+@pytest.mark.parametrize("sitemapper", [{"shard_size": 2}], indirect=True)
+def test_sharded(client):
+    assert "xmlns:" not in client.get("/sitemap.xml").get_data(as_text=True)
+
+    shard = client.get("/sitemap-2.xml").get_data(as_text=True)
+    assert 'xmlns:image="http://www.google.com/schemas/sitemap-image/1.1">' in shard
+    assert "xmlns:xhtml" not in shard
+
+
+def test_stream(client, expected_xml):
+    xml = client.get("/stream.xml").get_data(as_text=True)
+    assert 'xmlns:news="http://www.google.com/schemas/sitemap-news/0.9"' in xml
+    assert xml.split("\n", 2)[2] == expected_xml.split("\n", 2)[2]
+
+
+def test_no_extensions():
+    sitemapper = Sitemapper()
+    app = flask.Flask(__name__)
+    sitemapper.init_app(app)
+    app.add_url_rule("/", "r_home")
+    sitemapper.add_endpoint("r_home")
+
+    with app.test_request_context():
+        response = sitemapper.generate(stream=True)
+        assert "xmlns:" not in response.get_data(as_text=True)
+
+
+def test_video_and_news():
+    video = Video(
+        "https://example.com/thumb.jpg",
+        "Title & more",
+        "Description",
+        content_loc="https://example.com/video.mp4",
+        duration=60,
+        publication_date=datetime(2023, 1, 1, 12),
+    )
+    assert video.xml == [
+        "<video:video>",
+        "  <video:thumbnail_loc>https://example.com/thumb.jpg</video:thumbnail_loc>",
+        "  <video:title>Title &amp; more</video:title>",
+        "  <video:description>Description</video:description>",
+        "  <video:content_loc>https://example.com/video.mp4</video:content_loc>",
+        "  <video:duration>60</video:duration>",
+        "  <video:publication_date>2023-01-01T12:00:00</video:publication_date>",
+        "</video:video>",
+    ]
+
+    news = News("The Times", "en", "2023-01-01", "Headline")
+    assert news.xml[2] == "    <news:name>The Times</news:name>"
+    assert news.xml[5] == "  <news:publication_date>2023-01-01</news:publication_date>"
@@ -0,0 +1,149 @@
+import flask
+import pytest
+
+import flask_sitemapper.url
+from flask_sitemapper import Sitemapper
+
+CALLS = {"users": 0, "posts": 0}
+VERSION = {"posts": 1}
+
+
+def generate_user_ids():
+    CALLS["users"] += 1
+    return {"user_id": [1, 2]}
+
+
+def generate_post_ids():
+    CALLS["posts"] += 1
+    return {"post_id": list(range(1, VERSION["posts"] + 1))}
+
+
+@pytest.fixture
+def sitemapper(request):
+    CALLS.update(users=0, posts=0)
+    VERSION.update(posts=1)
+    return Sitemapper(**getattr(request, "param", {}))
+
+
+@pytest.fixture
+def client(sitemapper):
+    app = flask.Flask(__name__)
+    sitemapper.init_app(app)
+
+    @sitemapper.include(lastmod="2023-01-01")
+    @app.route("/")
+    def r_home():
+        return "<h1>Home</h1>"
+
+    @sitemapper.include(url_variables=generate_user_ids)
+    @app.route("/user/<int:user_id>")
+    def r_user(user_id):
+        return f"<h1>User #{user_id}</h1>"
+
+    @sitemapper.include(url_variables=generate_post_ids, version=lambda: VERSION["posts"])
+    @app.route("/post/<int:post_id>")
+    def r_post(post_id):
+        return f"<h1>Post #{post_id}</h1>"
+
+    @app.route("/sitemap.xml")
+    def r_sitemap():
+        return sitemapper.generate()
+
+    return app.test_client()
+
+
+@pytest.fixture
+def expected_xml():
+    return """<?xml version="1.0" encoding="utf-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <url>
+    <loc>https://localhost/</loc>
+    <lastmod>2023-01-01</lastmod>
+  </url>
+  <url>
+    <loc>https://localhost/user/1</loc>
+  </url>
+  <url>
+    <loc>https://localhost/user/2</loc>
+  </url>
+  <url>
+    <loc>https://localhost/post/1</loc>
+  </url>
+</urlset>"""
+
+
+def test_xml(client, expected_xml):
+    assert client.get("/sitemap.xml").text == expected_xml
+    assert client.get("/sitemap.xml").text == expected_xml
+
+
+@pytest.mark.parametrize("sitemapper", [{"engine": "writer"}], indirect=True)
+def test_writer_engine(client, expected_xml):
+    assert client.get("/sitemap.xml").text == expected_xml
+
+
+def test_uncached_endpoint(client):
+    client.get("/sitemap.xml")
+    client.get("/sitemap.xml")
+    assert CALLS["users"] == 2
+
+
+def test_versioned_endpoint(client, expected_xml):
+    client.get("/sitemap.xml")
+    client.get("/sitemap.xml")
+    assert CALLS["posts"] == 1
+
+    VERSION["posts"] = 2
+    response = client.get("/sitemap.xml")
+    assert CALLS["posts"] == 2
+    assert "<loc>https://localhost/post/2</loc>" in response.text
+
+
+def test_invalidate_endpoint(client, sitemapper):
+    client.get("/sitemap.xml")
+    sitemapper.invalidate("r_user")
+    client.get("/sitemap.xml")
+    assert CALLS["posts"] == 1
+
+    sitemapper.invalidate("r_post")
+    client.get("/sitemap.xml")
+    assert CALLS["posts"] == 2
+
+
+def test_endpoint_ttl(sitemapper):
+    app = flask.Flask(__name__)
+    sitemapper.init_app(app)
+    app.add_url_rule("/user/<int:user_id>", "r_user")
+    app.add_url_rule("/post/<int:post_id>", "r_post")
+    sitemapper.add_endpoint("r_user", url_variables=generate_user_ids, cache_ttl=0)
+    sitemapper.add_endpoint("r_post", url_variables=generate_post_ids, cache_ttl=60)
+
+    with app.test_request_context():
+        sitemapper.generate()
+        sitemapper.generate()
+    assert CALLS == {"users": 2, "posts": 1}
+
+
+def test_static_entries(client, sitemapper, monkeypatch):
+    client.get("/sitemap.xml")
+    assert len(sitemapper.static_entries) == 1
+
+    # static URLs are not built again for the same host
+    built = []
+
+    def url_for(endpoint, **kwargs):
+        built.append(endpoint)
+        return flask.url_for(endpoint, **kwargs)
+
+    monkeypatch.setattr(flask_sitemapper.url, "url_for", url_for)
+    assert b"<loc>https://localhost/</loc>" in client.get("/sitemap.xml").data
+    assert "r_home" not in built
+
+    # hosts are built separately, and adding a static URL builds them again
+    client.get("/sitemap.xml", base_url="http://example.com")
+    assert len(sitemapper.static_urls) == 2
+
+    sitemapper.add_endpoint("r_sitemap")
+    assert len(sitemapper.static_urls) == 0
+    sitemapper.invalidate()
+    assert b"<loc>https://localhost/sitemap.xml</loc>" in client.get("/sitemap.xml").data
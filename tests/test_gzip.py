@@ -1,9 +1,13 @@
 import gzip
+import threading
+import time
 
 import flask
 import pytest
 
 from flask_sitemapper import Sitemapper
+from flask_sitemapper.compression import COMPRESSORS
+from flask_sitemapper.gzip import gzip_compress, gzip_response
 
 
 @pytest.fixture
@@ -63,3 +67,62 @@ def test_xml(client, expected_xml):
 def test_not_accepting_gzip(client, expected_xml):
     response = client.get("/sitemap.xml")
     assert response.text == expected_xml
+
+
+def test_compressed_once(client, monkeypatch):
+    calls = []
+    monkeypatch.setitem(
+        COMPRESSORS, "gzip", lambda data, level: calls.append(level) or gzip_compress(data, level)
+    )
+
+    first = client.get("/sitemap.xml", headers={"Accept-Encoding": "gzip"})
+    second = client.get("/sitemap.xml", headers={"Accept-Encoding": "gzip"})
+    assert first.data == second.data
+    assert calls == [9]
+
+
+def test_gzip_level():
+    sitemapper = Sitemapper(gzip_level=1)
+    app = flask.Flask(__name__)
+    sitemapper.init_app(app)
+    sitemapper.add_endpoint("static", url_variables={"filename": ["a"] * 100})
+
+    with app.test_request_context(headers={"Accept-Encoding": "gzip"}):
+        data = sitemapper.generate(gzip=True).data
+        assert data == gzip_compress(sitemapper.generate().data, 1)
+
+
+def test_compressed_once_concurrently(client, monkeypatch):
+    calls = []
+
+    def slow_compress(data, level):
+        calls.append(level)
+        time.sleep(0.05)
+        return gzip_compress(data, level)
+
+    monkeypatch.setitem(COMPRESSORS, "gzip", slow_compress)
+    client.get("/sitemap.xml")
+
+    # requests for an encoding which is being compressed wait for it
+    def request():
+        client.get("/sitemap.xml", headers={"Accept-Encoding": "gzip"})
+
+    threads = [threading.Thread(target=request) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert calls == [9]
+
+
+@pytest.mark.parametrize(
+    "status, header, compressed",
+    [(200, "gzip", True), (200, "br", False), (404, "gzip", False)],
+)
+def test_gzip_response(status, header, compressed):
+    app = flask.Flask(__name__)
+    with app.test_request_context(headers={"Accept-Encoding": header}):
+        response = gzip_response(flask.Response("<urlset/>", status=status))
+        assert ("Content-Encoding" in response.headers) == compressed
+        if compressed:
+            assert gzip.decompress(response.data) == b"<urlset/>"
@@ -0,0 +1,81 @@
+import flask
+import pytest
+
+from flask_sitemapper import Sitemapper
+
+CALLS = []
+
+
+def generate_user_ids():
+    CALLS.append(flask.request.host)
+    return {"user_id": [1, 2]}
+
+
+@pytest.fixture
+def sitemapper(request):
+    CALLS.clear()
+    return Sitemapper(share_hosts=True, **getattr(request, "param", {"cache_ttl": 60}))
+
+
+@pytest.fixture
+def client(sitemapper):
+    app = flask.Flask(__name__)
+    sitemapper.init_app(app)
+
+    @sitemapper.include(lastmod="2023-01-01")
+    @app.route("/")
+    def r_home():
+        return "<h1>Home</h1>"
+
+    @sitemapper.include(url_variables=generate_user_ids)
+    @app.route("/user/<int:user_id>")
+    def r_user(user_id):
+        return f"<h1>User #{user_id}</h1>"
+
+    @app.route("/sitemap.xml")
+    def r_sitemap():
+        return sitemapper.generate(gzip=True)
+
+    return app.test_client()
+
+
+def expected_xml(host):
+    return f"""<?xml version="1.0" encoding="utf-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <url>
+    <loc>https://{host}/</loc>
+    <lastmod>2023-01-01</lastmod>
+  </url>
+  <url>
+    <loc>https://{host}/user/1</loc>
+  </url>
+  <url>
+    <loc>https://{host}/user/2</loc>
+  </url>
+</urlset>"""
+
+
+@pytest.mark.parametrize("sitemapper", [{"cache_ttl": 60}, {}], indirect=True)
+def test_hosts(client, sitemapper):
+    for host in ["example.com", "example.org:8080", "example.com"]:
+        response = client.get("/sitemap.xml", base_url=f"http://{host}")
+        assert response.get_data(as_text=True) == expected_xml(host)
+
+    # the url variables are only loaded once when the xml is cached
+    assert CALLS == ["sitemapper.invalid"] * (1 if sitemapper.cache_xml else 3)
+
+
+def test_compressed_per_host(client, sitemapper):
+    headers = {"Accept-Encoding": "gzip"}
+    first = client.get("/sitemap.xml", base_url="http://example.com", headers=headers)
+    second = client.get("/sitemap.xml", base_url="http://example.org", headers=headers)
+    assert first.headers["Content-Encoding"] == second.headers["Content-Encoding"] == "gzip"
+    assert first.get_etag() != second.get_etag()
+    assert len(sitemapper.cache) == 2
+
+
+def test_invalidate(client, sitemapper):
+    client.get("/sitemap.xml", base_url="http://example.com")
+    sitemapper.invalidate("r_user")
+    client.get("/sitemap.xml", base_url="http://example.org")
+    assert len(CALLS) == 2
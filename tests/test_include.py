@@ -0,0 +1,89 @@
+import flask
+import pytest
+
+from flask_sitemapper import Sitemapper
+
+CONTEXTS = []
+
+
+@pytest.fixture
+def app():
+    CONTEXTS.clear()
+    sitemapper = Sitemapper()
+    app = flask.Flask(__name__)
+
+    @app.route("/")
+    @sitemapper.include()
+    def r_home():
+        CONTEXTS.append(flask.globals.app_ctx._get_current_object())
+        return flask.current_app.name
+
+    sitemapper.init_app(app)
+    return app
+
+
+def test_no_context_pushed_in_request(app):
+    with app.test_request_context("/"):
+        outer = flask.globals.app_ctx._get_current_object()
+        app.full_dispatch_request()
+    assert CONTEXTS == [outer]
+
+
+def test_direct_call(app):
+    assert app.view_functions["r_home"]() == app.name
+    assert len(CONTEXTS) == 1
+
+
+def test_endpoint_index():
+    sitemapper = Sitemapper()
+    app = flask.Flask(__name__)
+    sitemapper.init_app(app)
+
+    def view():
+        return ""
+
+    app.add_url_rule("/first", "first", view)
+    app.add_url_rule("/second", "second", view)
+    sitemapper.add_endpoint(view)
+
+    def other():
+        return ""
+
+    # views registered after the index was built are found, and replaced views are indexed again
+    app.add_url_rule("/other", "other", other)
+    sitemapper.add_endpoint(other)
+    app.view_functions["first"] = other
+    sitemapper.add_endpoint(view)
+
+    with app.test_request_context():
+        xml = sitemapper.generate().get_data(as_text=True)
+
+    assert xml.count("/first") == 1
+    assert xml.count("/second") == 1
+    assert xml.count("/other") == 1
+
+
+def test_replaced_view():
+    sitemapper = Sitemapper()
+    app = flask.Flask(__name__)
+    sitemapper.init_app(app)
+
+    def view():
+        return ""
+
+    def replacement():
+        return ""
+
+    app.add_url_rule("/first", "first", view)
+    app.add_url_rule("/second", "second", view)
+    sitemapper.add_endpoint(view)
+
+    # a view replaced under an endpoint which was indexed already is found
+    app.view_functions["second"] = replacement
+    sitemapper.add_endpoint(replacement)
+
+    with app.test_request_context():
+        xml = sitemapper.generate().get_data(as_text=True)
+
+    assert xml.count("/first") == 1
+    assert xml.count("/second") == 1
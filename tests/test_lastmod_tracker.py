@@ -0,0 +1,63 @@
+from datetime import datetime
+
+import flask
+import pytest
+
+from flask_sitemapper import LastmodTracker, Sitemapper
+
+UPDATED = {}
+QUERIES = []
+
+
+def changed_since(since):
+    QUERIES.append(since)
+    return [({"user_id": i}, updated) for i, (updated, changed) in UPDATED.items() if changed]
+
+
+@pytest.fixture
+def client():
+    UPDATED.clear()
+    UPDATED.update({1: ("2023-01-01", True), 2: ("2023-02-02", True), 3: (None, True)})
+    QUERIES.clear()
+
+    sitemapper = Sitemapper()
+    app = flask.Flask(__name__)
+    sitemapper.init_app(app)
+
+    @sitemapper.include(
+        url_variables=lambda: {"user_id": [1, 2, 3]},
+        lastmod=LastmodTracker(changed_since, key="user_id"),
+    )
+    @app.route("/user/<int:user_id>")
+    def r_user(user_id):
+        return f"<h1>User #{user_id}</h1>"
+
+    @app.route("/sitemap.xml")
+    def r_sitemap():
+        return sitemapper.generate()
+
+    return app.test_client()
+
+
+def test_deltas(client):
+    xml = client.get("/sitemap.xml").get_data(as_text=True)
+    assert xml.count("<lastmod>") == 2
+    assert "<lastmod>2023-02-02</lastmod>" in xml
+
+    # only rows changed since the previous load are returned and applied
+    UPDATED.update({i: (updated, False) for i, (updated, _) in UPDATED.items()})
+    UPDATED[2] = ("2023-03-03", True)
+    xml = client.get("/sitemap.xml").get_data(as_text=True)
+    assert "<lastmod>2023-01-01</lastmod>" in xml
+    assert "<lastmod>2023-03-03</lastmod>" in xml
+    assert "2023-02-02" not in xml
+
+    assert QUERIES[0] is None
+    assert isinstance(QUERIES[1], datetime) and QUERIES[1].tzinfo is not None
+
+
+def test_row_key():
+    tracker = LastmodTracker(lambda since: [({"a": 1, "b": 2}, "2023-01-01")])
+    tracker.load()
+    assert tracker.get({"b": 2, "a": 1}) == "2023-01-01"
+    assert tracker.get({"a": 2, "b": 2}) is None
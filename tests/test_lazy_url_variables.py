@@ -0,0 +1,120 @@
+import flask
+import pytest
+
+from flask_sitemapper import Paginator, Sitemapper
+
+POSTS = [{"post_id": n} for n in range(1, 6)]
+FETCHES = []
+
+
+def generate_users():
+    for user_id in (1, 2):
+        yield {"user_id": user_id}
+
+
+def fetch_posts(offset, limit):
+    FETCHES.append((offset, limit))
+    return POSTS[offset : offset + limit]
+
+
+def fetch_posts_after(after, limit):
+    FETCHES.append((after, limit))
+    rows = [row for row in POSTS if after is None or row["post_id"] > after]
+    return rows[:limit]
+
+
+@pytest.fixture
+def sitemapper():
+    FETCHES.clear()
+    return Sitemapper(shard_size=3)
+
+
+@pytest.fixture
+def client(sitemapper):
+    app = flask.Flask(__name__)
+    sitemapper.init_app(app)
+
+    @sitemapper.include(url_variables=generate_users)
+    @app.route("/user/<int:user_id>")
+    def r_user(user_id):
+        return f"<h1>User #{user_id}</h1>"
+
+    @sitemapper.include(
+        url_variables=Paginator(fetch_posts, count=lambda: len(POSTS), page_size=2),
+        lastmod=[f"2023-01-0{n}" for n in range(1, 6)],
+    )
+    @app.route("/post/<int:post_id>")
+    def r_post(post_id):
+        return f"<h1>Post #{post_id}</h1>"
+
+    @app.route("/sitemap.xml")
+    def r_sitemap():
+        return sitemapper.generate()
+
+    return app.test_client()
+
+
+@pytest.fixture
+def expected_shard_xml():
+    return """<?xml version="1.0" encoding="utf-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <url>
+    <loc>https://localhost/post/2</loc>
+    <lastmod>2023-01-02</lastmod>
+  </url>
+  <url>
+    <loc>https://localhost/post/3</loc>
+    <lastmod>2023-01-03</lastmod>
+  </url>
+  <url>
+    <loc>https://localhost/post/4</loc>
+    <lastmod>2023-01-04</lastmod>
+  </url>
+</urlset>"""
+
+
+def test_index(client):
+    response = client.get("/sitemap.xml")
+    assert response.text.count("<sitemap>") == 3
+    assert FETCHES == []
+
+
+def test_generator_function(client):
+    response = client.get("/sitemap-1.xml")
+    assert "https://localhost/user/1" in response.text
+    assert "https://localhost/user/2" in response.text
+    assert "https://localhost/post/1" in response.text
+
+
+def test_shard_fetches_pages(client, expected_shard_xml):
+    response = client.get("/sitemap-2.xml")
+    assert response.text == expected_shard_xml
+    assert FETCHES == [(1, 2), (3, 1)]
+
+
+def test_keyset():
+    paginator = Paginator(fetch_posts_after, page_size=2, key="post_id")
+    assert list(paginator.iter_rows(1, 4)) == POSTS[1:4]
+    assert paginator.count() == 5
+
+
+def test_offset_without_count():
+    FETCHES.clear()
+    paginator = Paginator(fetch_posts, page_size=2)
+    assert list(paginator.iter_rows()) == POSTS
+    assert paginator.count() == 5
+
+
+def test_iterator(sitemapper):
+    app = flask.Flask(__name__)
+    sitemapper.init_app(app)
+
+    @app.route("/user/<int:user_id>")
+    def r_user(user_id):
+        return f"<h1>User #{user_id}</h1>"
+
+    # an iterator would be exhausted after the first sitemap, unlike a generator function
+    with pytest.raises(TypeError):
+        sitemapper.add_endpoint(r_user, url_variables=generate_users())
+    with pytest.raises(TypeError):
+        sitemapper.add_endpoint(r_user, url_variables=iter([{"user_id": 1}]))
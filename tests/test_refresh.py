@@ -0,0 +1,124 @@
+import threading
+import time
+
+import flask
+import pytest
+
+from flask_sitemapper import Sitemapper
+
+USERS = {"ids": [1]}
+CALLS = []
+
+
+def generate_user_ids():
+    CALLS.append(None)
+    return {"user_id": list(USERS["ids"])}
+
+
+@pytest.fixture
+def sitemapper(request):
+    USERS["ids"] = [1]
+    CALLS.clear()
+    return Sitemapper(
+        **getattr(request, "param", {"cache_ttl": 60, "stale_while_revalidate": True})
+    )
+
+
+@pytest.fixture
+def client(sitemapper):
+    app = flask.Flask(__name__)
+    sitemapper.init_app(app)
+
+    @sitemapper.include(url_variables=generate_user_ids)
+    @app.route("/user/<int:user_id>")
+    def r_user(user_id):
+        return f"<h1>User #{user_id}</h1>"
+
+    @app.route("/sitemap.xml")
+    def r_sitemap():
+        return sitemapper.generate()
+
+    return app.test_client()
+
+
+def test_serves_stale(client, sitemapper):
+    client.get("/sitemap.xml")
+    USERS["ids"] = [1, 2]
+    sitemapper.cache.expire()
+
+    # the stale sitemap is served while it is rebuilt
+    response = client.get("/sitemap.xml")
+    assert "/user/2" not in response.text
+
+    sitemapper.refresher.wait()
+    assert "/user/2" in client.get("/sitemap.xml").text
+    assert len(CALLS) == 2
+
+
+def test_invalidate(client, sitemapper):
+    client.get("/sitemap.xml")
+    USERS["ids"] = [1, 2]
+    sitemapper.invalidate()
+    sitemapper.refresher.wait()
+    assert "/user/2" in client.get("/sitemap.xml").text
+
+
+def test_rebuild_error(client, sitemapper):
+    client.get("/sitemap.xml")
+    USERS["ids"] = None
+    sitemapper.invalidate()
+    sitemapper.refresher.wait()
+    assert "/user/1" in client.get("/sitemap.xml").text
+
+
+@pytest.mark.parametrize("sitemapper", [{"refresh_interval": 0.01}], indirect=True)
+def test_schedule(client, sitemapper):
+    client.get("/sitemap.xml")
+    USERS["ids"] = [1, 2]
+
+    try:
+        for _ in range(100):
+            time.sleep(0.01)
+            sitemapper.refresher.wait()
+            if "/user/2" in client.get("/sitemap.xml").text:
+                break
+        else:
+            pytest.fail("the sitemap was not refreshed")
+    finally:
+        sitemapper.refresher.stop()
+
+
+@pytest.mark.parametrize("sitemapper", [{"cache_ttl": 60}], indirect=True)
+def test_single_build(sitemapper):
+    app = flask.Flask(__name__)
+    sitemapper.init_app(app)
+    started = threading.Event()
+
+    def slow_user_ids():
+        started.set()
+        time.sleep(0.05)
+        return generate_user_ids()
+
+    sitemapper.add_endpoint("r_user", url_variables=slow_user_ids)
+    app.add_url_rule("/user/<int:user_id>", "r_user")
+
+    def request():
+        with app.test_request_context():
+            sitemapper.generate()
+
+    threads = [threading.Thread(target=request) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(CALLS) == 1
+
+
+def test_locks_removed(client, sitemapper):
+    for host in ["a.com", "b.com", "c.com"]:
+        client.get("/sitemap.xml", base_url=f"http://{host}")
+    sitemapper.invalidate()
+    sitemapper.refresher.wait()
+
+    # locks are only kept while builds hold or wait for them
+    assert sitemapper.refresher.locks == {}
@@ -0,0 +1,142 @@
+import gzip
+import threading
+import time
+
+import flask
+import pytest
+
+from flask_sitemapper import Sitemapper
+
+
+@pytest.fixture
+def client():
+    sitemapper = Sitemapper(shard_size=2)
+    app = flask.Flask(__name__)
+    sitemapper.init_app(app)
+
+    @sitemapper.include()
+    @app.route("/")
+    def r_home():
+        return "<h1>Home</h1>"
+
+    @sitemapper.include(
+        url_variables={"user_id": [1, 2, 3]}, lastmod=["2023-01-01", "2023-02-02", "2023-03-03"]
+    )
+    @app.route("/user/<int:user_id>")
+    def r_user(user_id):
+        return f"<h1>User #{user_id}</h1>"
+
+    @sitemapper.include(url_variables=lambda: {"post_id": [4]})
+    @app.route("/post/<int:post_id>")
+    def r_post(post_id):
+        return f"<h1>Post #{post_id}</h1>"
+
+    @app.route("/sitemap.xml")
+    def r_sitemap():
+        return sitemapper.generate()
+
+    return app.test_client()
+
+
+@pytest.fixture
+def expected_xml():
+    return """<?xml version="1.0" encoding="utf-8"?>
+<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <sitemap>
+    <loc>https://localhost/sitemap-1.xml</loc>
+  </sitemap>
+  <sitemap>
+    <loc>https://localhost/sitemap-2.xml</loc>
+  </sitemap>
+  <sitemap>
+    <loc>https://localhost/sitemap-3.xml</loc>
+  </sitemap>
+</sitemapindex>"""
+
+
+@pytest.fixture
+def expected_shard_xml():
+    return """<?xml version="1.0" encoding="utf-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <url>
+    <loc>https://localhost/user/2</loc>
+    <lastmod>2023-02-02</lastmod>
+  </url>
+  <url>
+    <loc>https://localhost/user/3</loc>
+    <lastmod>2023-03-03</lastmod>
+  </url>
+</urlset>"""
+
+
+def test_xml(client, expected_xml):
+    response = client.get("/sitemap.xml")
+    assert response.text == expected_xml
+
+
+def test_shard_xml(client, expected_shard_xml):
+    response = client.get("/sitemap-2.xml")
+    assert response.mimetype == "application/xml"
+    assert response.text == expected_shard_xml
+
+
+def test_last_shard(client):
+    response = client.get("/sitemap-3.xml")
+    assert "https://localhost/post/4" in response.text
+    assert "https://localhost/user/" not in response.text
+
+
+def test_shard_gzip(client, expected_shard_xml):
+    response = client.get("/sitemap-2.xml", headers={"Accept-Encoding": "gzip"})
+    assert str(gzip.decompress(response.data), "utf-8") == expected_shard_xml
+
+
+def test_missing_shard(client):
+    assert client.get("/sitemap-0.xml").status_code == 404
+    assert client.get("/sitemap-4.xml").status_code == 404
+
+
+def test_unsharded():
+    sitemapper = Sitemapper(shard_size=2)
+    app = flask.Flask(__name__)
+    sitemapper.init_app(app)
+
+    @sitemapper.include()
+    @app.route("/")
+    def r_home():
+        return "<h1>Home</h1>"
+
+    with app.test_request_context():
+        response = sitemapper.generate()
+    assert "<urlset" in response.get_data(as_text=True)
+
+
+def test_protocol_limit():
+    assert Sitemapper(shard_size=100000).shard_size == 50000
+
+
+def test_counts_once():
+    sitemapper = Sitemapper(shard_size=2, cache_ttl=60)
+    app = flask.Flask(__name__)
+    sitemapper.init_app(app)
+    calls = []
+
+    def generate_user_ids():
+        calls.append(1)
+        time.sleep(0.05)
+        return {"user_id": [1, 2, 3]}
+
+    app.add_url_rule("/user/<int:user_id>", "r_user")
+    sitemapper.add_endpoint("r_user", url_variables=generate_user_ids)
+
+    def request():
+        with app.test_request_context():
+            sitemapper.generate(shard=2)
+
+    # the URLs are counted once and rendered once, while other requests wait for the build
+    threads = [threading.Thread(target=request) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 2
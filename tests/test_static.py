@@ -0,0 +1,83 @@
+import gzip
+
+import flask
+import pytest
+
+from flask_sitemapper import Sitemapper
+
+
+@pytest.fixture
+def sitemapper(tmp_path):
+    return Sitemapper(shard_size=2, static_directory=tmp_path)
+
+
+@pytest.fixture
+def client(sitemapper):
+    app = flask.Flask(__name__)
+    sitemapper.init_app(app)
+
+    @sitemapper.include()
+    @app.route("/")
+    def r_home():
+        return "<h1>Home</h1>"
+
+    @sitemapper.include(url_variables=lambda: {"user_id": [1, 2, 3]})
+    @app.route("/user/<int:user_id>")
+    def r_user(user_id):
+        return f"<h1>User #{user_id}</h1>"
+
+    @app.route("/sitemap.xml")
+    def r_sitemap():
+        return sitemapper.generate(gzip=True)
+
+    return app.test_client()
+
+
+def test_files(client, sitemapper, tmp_path):
+    sitemapper.build_static(base_url="https://example.com")
+    names = sorted(path.name for path in tmp_path.iterdir())
+    assert names == [
+        "sitemap-1.xml",
+        "sitemap-1.xml.gz",
+        "sitemap-2.xml",
+        "sitemap-2.xml.gz",
+        "sitemap.xml",
+        "sitemap.xml.gz",
+    ]
+    assert "<loc>https://example.com/sitemap-2.xml</loc>" in (tmp_path / "sitemap.xml").read_text()
+    assert (
+        gzip.decompress((tmp_path / "sitemap-1.xml.gz").read_bytes())
+        == (tmp_path / "sitemap-1.xml").read_bytes()
+    )
+
+
+def test_serves_files(client, sitemapper, tmp_path):
+    sitemapper.build_static(base_url="http://localhost")
+    (tmp_path / "sitemap-2.xml").write_text("static")
+
+    response = client.get("/sitemap-2.xml", headers={"Accept-Encoding": ""})
+    assert response.mimetype == "application/xml"
+    assert response.text == "static"
+    assert "Accept-Encoding" in response.vary
+
+
+def test_serves_gzip(client, sitemapper):
+    sitemapper.build_static(base_url="http://localhost")
+    response = client.get("/sitemap.xml", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.vary
+    assert b"<loc>https://localhost/sitemap-1.xml</loc>" in gzip.decompress(response.data)
+
+
+def test_renders_without_files(client):
+    response = client.get("/sitemap.xml", headers={"Accept-Encoding": "gzip"})
+    assert b"<loc>https://localhost/sitemap-1.xml</loc>" in gzip.decompress(response.data)
+
+
+def test_removes_old_shards(client, sitemapper, tmp_path):
+    sitemapper.build_static(base_url="http://localhost")
+    (tmp_path / "sitemap-3.xml").write_text("old")
+    (tmp_path / "sitemap-3.xml.gz").write_text("old")
+    sitemapper.build_static(base_url="http://localhost")
+    assert not (tmp_path / "sitemap-3.xml").exists()
+    assert not (tmp_path / "sitemap-3.xml.gz").exists()
@@ -0,0 +1,275 @@
+import mmap
+import os
+import threading
+import time
+from fnmatch import fnmatchcase
+
+import flask
+import pytest
+
+from flask_sitemapper import Sitemapper
+from flask_sitemapper.stores import FilesystemStore, SQLiteStore
+
+
+class FakeRedis:
+    """Implements the parts of the redis-py client used as a store, returning names as bytes"""
+
+    def __init__(self):
+        self.data = {}
+        self.locks = {}
+
+    def get(self, name):
+        return self.data.get(name)
+
+    def set(self, name, value):
+        self.data[name] = value
+
+    def delete(self, *names):
+        for name in names:
+            self.data.pop(name, None)
+
+    def scan_iter(self, match="*"):
+        return [name.encode() for name in list(self.data) if fnmatchcase(name, match)]
+
+    def lock(self, name, timeout=None):
+        return self.locks.setdefault(name, threading.Lock())
+
+
+CALLS = []
+USER_IDS = []
+
+
+def generate_user_ids():
+    CALLS.append(None)
+    return {"user_id": list(USER_IDS)}
+
+
+@pytest.fixture(params=["filesystem", "memory_map", "sqlite", "redis"])
+def store(request, tmp_path):
+    if request.param == "filesystem":
+        return FilesystemStore(str(tmp_path / "sitemaps"))
+    if request.param == "memory_map":
+        return FilesystemStore(str(tmp_path / "sitemaps"), memory_map=True)
+    if request.param == "sqlite":
+        return SQLiteStore(str(tmp_path / "sitemaps.db"))
+    return FakeRedis()
+
+
+@pytest.fixture
+def sitemappers(store, request):
+    """Two sitemappers sharing the store, like several processes serving the same app"""
+    CALLS.clear()
+    USER_IDS[:] = [1, 2]
+    options = getattr(request, "param", {})
+    return [Sitemapper(cache_store=store, cache_ttl=60, **options) for _ in range(2)]
+
+
+@pytest.fixture
+def clients(sitemappers):
+    clients = []
+    for sitemapper in sitemappers:
+        app = flask.Flask(__name__)
+        sitemapper.init_app(app)
+
+        @sitemapper.include(url_variables=generate_user_ids)
+        @app.route("/user/<int:user_id>")
+        def r_user(user_id):
+            return f"<h1>User #{user_id}</h1>"
+
+        # bind this app's sitemapper, as the loop variable is reassigned
+        @app.route("/sitemap.xml")
+        def r_sitemap(sitemapper=sitemapper):
+            return sitemapper.generate(gzip=True)
+
+        clients.append(app.test_client())
+    return clients
+
+
+def test_shared_between_processes(clients, sitemappers):
+    first, second = clients
+
+    response = first.get("/sitemap.xml")
+    assert response.get_data(as_text=True).count("<loc>") == 2
+    assert second.get("/sitemap.xml").data == response.data
+    assert second.get("/sitemap.xml").get_etag() == response.get_etag()
+    assert len(CALLS) == 1
+
+    # compressed copies are shared as well
+    headers = {"Accept-Encoding": "gzip"}
+    compressed = first.get("/sitemap.xml", headers=headers)
+    cache = sitemappers[1].cache
+    key = ("http://localhost/", None)
+    assert cache.get_encoding(key, cache.get(key), "gzip") is not None
+    assert second.get("/sitemap.xml", headers=headers).data == compressed.data
+
+
+def test_loads_negotiated_encoding(clients, store, monkeypatch):
+    first, second = clients
+    headers = {"Accept-Encoding": "gzip"}
+    etag = first.get("/sitemap.xml", headers=headers).get_etag()[0]
+
+    read = []
+    get = store.get
+    monkeypatch.setattr(store, "get", lambda name: read.append(name) or get(name))
+
+    # revalidations only read the metadata, and responses only read the negotiated encoding
+    headers["If-None-Match"] = f'"{etag}"'
+    assert second.get("/sitemap.xml", headers=headers).status_code == 304
+    assert all(name.endswith(".meta") for name in read)
+    assert second.get("/sitemap.xml").status_code == 200
+    assert not any(name.endswith(".gzip") for name in read)
+
+
+def test_missing_xml(clients, store):
+    first, second = clients
+    first.get("/sitemap.xml")
+
+    # the xml is built again if it is removed after its metadata was stored
+    for name in list(store.scan_iter("*.identity")):
+        store.delete(name.decode() if isinstance(name, bytes) else name)
+    assert second.get("/sitemap.xml").get_data(as_text=True).count("<loc>") == 2
+    assert len(CALLS) == 2
+
+
+def test_invalidate(clients, sitemappers):
+    first, _ = clients
+    first.get("/sitemap.xml")
+    sitemappers[1].invalidate()
+    assert len(sitemappers[0].cache) == 0
+
+    first.get("/sitemap.xml")
+    assert len(CALLS) == 2
+
+
+@pytest.mark.parametrize("sitemappers", [{"share_hosts": True}, {}], indirect=True)
+def test_invalidate_in_process(clients, sitemappers):
+    first, second = clients
+    first.get("/sitemap.xml", base_url="http://a.com")
+    second.get("/sitemap.xml", base_url="http://b.com")
+
+    # other processes do not render the sitemap again from their own caches
+    USER_IDS.append(3)
+    sitemappers[0].invalidate()
+    for client, host in [(first, "a.com"), (second, "b.com"), (second, "c.com")]:
+        response = client.get("/sitemap.xml", base_url=f"http://{host}")
+        assert response.get_data(as_text=True).count("<loc>") == 3
+
+
+@pytest.mark.parametrize("sitemappers", [{"stale_while_revalidate": True}], indirect=True)
+def test_stale_while_revalidate(clients, sitemappers):
+    first, second = clients
+    first.get("/sitemap.xml")
+
+    # each process refreshes the expired xml, but only the first rebuilds it
+    sitemappers[0].cache.expire()
+    first.get("/sitemap.xml")
+    sitemappers[0].refresher.wait()
+    second.get("/sitemap.xml")
+    sitemappers[1].refresher.wait()
+    assert len(CALLS) == 2
+
+
+@pytest.mark.parametrize("sitemappers", [{"cache_size": 2}], indirect=True)
+def test_max_entries(clients, sitemappers):
+    for host in ["a.com", "b.com", "c.com"]:
+        clients[0].get("/sitemap.xml", base_url=f"http://{host}")
+    assert sorted(sitemappers[0].cache.keys()) == [
+        ("http://b.com/", None),
+        ("http://c.com/", None),
+    ]
+
+
+def test_lock(store):
+    held = []
+
+    def hold():
+        with store.lock("sitemapper-test", timeout=10):
+            held.append(time.monotonic())
+            time.sleep(0.1)
+
+    threads = [threading.Thread(target=hold) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert held[1] - held[0] >= 0.1
+
+
+@pytest.mark.parametrize("store", ["filesystem", "sqlite"], indirect=True)
+def test_lock_refreshed(store):
+    held = []
+
+    def hold():
+        with store.lock("sitemapper-test", timeout=0.1):
+            held.append(time.monotonic())
+            time.sleep(0.3)
+
+    # a lock held for longer than its timeout is not taken over while its holder is alive
+    threads = [threading.Thread(target=hold) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.05)
+    for thread in threads:
+        thread.join()
+    assert held[1] - held[0] >= 0.3
+
+
+def test_stale_lock(tmp_path):
+    store = FilesystemStore(str(tmp_path))
+    lock = tmp_path / "sitemapper-test.lock"
+    lock.write_bytes(b"dead")
+    os.utime(lock, (0, 0))
+    held = []
+
+    def hold():
+        with store.lock("sitemapper-test", timeout=10):
+            held.append((time.monotonic(), lock.read_bytes()))
+            time.sleep(0.1)
+            held.append((time.monotonic(), lock.read_bytes()))
+
+    # waiters taking over the same stale lock at once hold it one at a time
+    threads = [threading.Thread(target=hold) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(held[i + 1][0] - held[i][0] >= 0.1 for i in range(0, len(held), 2))
+    assert all(held[i][1] == held[i + 1][1] != b"dead" for i in range(0, len(held), 2))
+    assert not lock.exists()
+
+
+def test_lock_taken_over(tmp_path):
+    store = FilesystemStore(str(tmp_path))
+    with store.lock("sitemapper-test"):
+        # another process took over the lock, which is kept when the previous holder finishes
+        (tmp_path / "sitemapper-test.lock").write_bytes(b"other")
+    assert (tmp_path / "sitemapper-test.lock").read_bytes() == b"other"
+
+
+@pytest.mark.parametrize("store", ["memory_map"], indirect=True)
+def test_memory_map(clients, sitemappers, monkeypatch):
+    monkeypatch.setattr("flask_sitemapper.sitemapper.MAPPED_CHUNK_SIZE", 64)
+    first, second = clients
+
+    response = first.get("/sitemap.xml")
+    mapped = second.get("/sitemap.xml")
+    assert mapped.data == response.data
+    assert mapped.content_length == len(response.data)
+    cache = sitemappers[1].cache
+    key = ("http://localhost/", None)
+    assert isinstance(cache.get_encoding(key, cache.get(key), "identity"), mmap.mmap)
+
+    headers = {"If-None-Match": f'"{mapped.get_etag()[0]}"'}
+    assert second.get("/sitemap.xml", headers=headers).status_code == 304
+
+
+def test_memory_map_swap(tmp_path):
+    store = FilesystemStore(str(tmp_path), memory_map=True)
+    store.set("sitemap", b"first")
+    mapped = store.get("sitemap")
+    assert isinstance(mapped, mmap.mmap)
+
+    # replacing a file does not change maps of the previous file
+    store.set("sitemap", b"second")
+    assert mapped[:] == b"first"
+    assert store.get("sitemap")[:] == b"second"
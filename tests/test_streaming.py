@@ -0,0 +1,85 @@
+import gzip
+
+import flask
+import pytest
+
+from flask_sitemapper import Sitemapper
+
+
+@pytest.fixture
+def client():
+    sitemapper = Sitemapper()
+    app = flask.Flask(__name__)
+    sitemapper.init_app(app)
+
+    @sitemapper.include()
+    @app.route("/")
+    def r_home():
+        return "<h1>Home</h1>"
+
+    @sitemapper.include(url_variables=lambda: {"user_id": [1, 2]}, changefreq="daily")
+    @app.route("/user/<int:user_id>")
+    def r_user(user_id):
+        return f"<h1>User #{user_id}</h1>"
+
+    @app.route("/sitemap.xml")
+    def r_sitemap():
+        return sitemapper.generate(stream=True)
+
+    @app.route("/sitemap.xml.gz")
+    def r_sitemap_gzip():
+        return sitemapper.generate(gzip=True, stream=True)
+
+    return app.test_client()
+
+
+@pytest.fixture
+def expected_xml():
+    return """<?xml version="1.0" encoding="utf-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <url>
+    <loc>https://localhost/</loc>
+  </url>
+  <url>
+    <loc>https://localhost/user/1</loc>
+    <changefreq>daily</changefreq>
+  </url>
+  <url>
+    <loc>https://localhost/user/2</loc>
+    <changefreq>daily</changefreq>
+  </url>
+</urlset>"""
+
+
+def test_status_code(client):
+    response = client.get("/sitemap.xml")
+    assert response.status_code == 200
+
+
+def test_mimetype(client):
+    response = client.get("/sitemap.xml")
+    assert response.mimetype == "application/xml"
+
+
+def test_streamed(client):
+    response = client.get("/sitemap.xml")
+    assert response.is_streamed
+
+
+def test_xml(client, expected_xml):
+    response = client.get("/sitemap.xml")
+    assert response.text == expected_xml
+
+
+def test_gzip_xml(client, expected_xml):
+    response = client.get("/sitemap.xml.gz", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.vary
+    assert str(gzip.decompress(response.data), "utf-8") == expected_xml
+
+
+def test_not_accepting_gzip(client, expected_xml):
+    response = client.get("/sitemap.xml.gz")
+    assert "Content-Encoding" not in response.headers
+    assert "Accept-Encoding" in response.vary
+    assert response.text == expected_xml
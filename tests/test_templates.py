@@ -0,0 +1,9 @@
+from flask_sitemapper.templates import SITEMAP, SITEMAP_INDEX, compile_template
+
+
+def test_compiled_once():
+    assert compile_template(SITEMAP) is compile_template(SITEMAP)
+
+
+def test_templates_differ():
+    assert compile_template(SITEMAP) is not compile_template(SITEMAP_INDEX)
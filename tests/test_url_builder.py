@@ -0,0 +1,66 @@
+import flask
+import pytest
+
+from flask_sitemapper.url import URLBuilder
+
+VALUES = [{"name": "john"}, {"name": "a b/c?d&e"}, {"name": "ünïcode"}, {"name": "x", "page": 2}]
+
+
+@pytest.fixture
+def app():
+    app = flask.Flask(__name__)
+
+    @app.route("/user/<name>")
+    def r_user(name):
+        return f"<h1>{name}</h1>"
+
+    @app.route("/path/<path:name>")
+    def r_path(name):
+        return f"<h1>{name}</h1>"
+
+    @app.route("/first/<name>")
+    @app.route("/second/<name>")
+    def r_multiple(name):
+        return f"<h1>{name}</h1>"
+
+    return app
+
+
+@pytest.mark.parametrize("endpoint", ["r_user", "r_path", "r_multiple"])
+@pytest.mark.parametrize("base_url", ["http://localhost/", "https://example.com:8000/app/"])
+def test_matches_url_for(app, endpoint, base_url):
+    with app.test_request_context(base_url=base_url):
+        builder = URLBuilder(endpoint, "https")
+        for values in VALUES:
+            expected = flask.url_for(endpoint, _external=True, _scheme="https", **values)
+            assert builder.build(values) == expected
+
+
+def test_uses_rule(app):
+    with app.test_request_context():
+        assert URLBuilder("r_user", "https").rule is not None
+        assert URLBuilder("r_multiple", "https").rule is None
+
+
+def test_server_name(app):
+    app.config["SERVER_NAME"] = "example.com"
+    with app.app_context():
+        builder = URLBuilder("r_user", "http")
+        assert builder.build({"name": "john"}) == "http://example.com/user/john"
+
+
+def test_url_defaults(app):
+    @app.url_defaults
+    def add_name(endpoint, values):
+        values.setdefault("name", "default")
+
+    with app.test_request_context():
+        builder = URLBuilder("r_user", "https")
+        assert builder.rule is None
+        assert builder.build({}) == "https://localhost/user/default"
+
+
+def test_build_error(app):
+    with app.test_request_context():
+        with pytest.raises(Exception):
+            URLBuilder("r_user", "https").build({})